@@ -2,40 +2,359 @@
 FastAPI backend for CAN Intrusion Detection System
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
+import numpy as np
+import os
+import asyncio
+import json
+import secrets
+import time
+from pathlib import Path
 from contextlib import asynccontextmanager
+from pydantic import ValidationError
 
 from models.svm_model import SVMDetector
 from models.lstm_model import LSTMDetector
 from models.battery_model import BatteryDetector
-from schemas.requests import SensorReading, AttackRequest
+from models.attribution import rank_features
+from schemas.requests import (
+    AttributionMethod, SensorReading, DetectOptions, DetectRequest, AttackRequest, AttackStreamRequest, ModelLoadRequest, ModelVersionRequest
+)
 from utils.attack_gen import AttackGenerator
+from schemas.features import LSTM_COLUMNS, BATTERY_COLUMNS
+from utils.batching import InferenceScheduler
+from utils.cache import ScoreCache
+from utils.cascade import Cascade
+from utils.session import StreamSession
+from utils.timing import TimingDetector
+from utils.fleet import FleetProcessor
+from utils.shared import SHARED_DIR_ENV, open_arrays
+from utils.frames import FRAME_CONTENT_TYPE, FrameError, check_finite, decode_frames, json_loads, parse_readings, readings_matrix
+from utils.lazy import LazyModel
+from utils.online import OnlineTrainer
+from utils.registry import ModelSlot
+from utils.shadow import ShadowScorer
+
+# Versioned models load in the background; routes use `loaded(name)`.
+# "online" is the retraining service, a plain LazyModel.
+models: dict[str, ModelSlot | LazyModel] = {}
+inference_scheduler = None
+shadow_scorer = None
+fleet_processor = None
+score_caches: dict[str, ScoreCache] = {}
+cascade: Cascade | None = None
+timing_detector: TimingDetector | None = None
+# Alert queues of the vehicles connected to /ws/fleet
+fleet_subscribers: dict[str, asyncio.Queue] = {}
+
+
+def _load_svm(**options):
+    shared_dir = os.getenv(SHARED_DIR_ENV)
+    if shared_dir and not options:
+        # Worker under `manage.py serve`: map the arrays the parent exported
+        return SVMDetector.from_arrays(open_arrays(shared_dir))
+    return SVMDetector(**{"mode": os.getenv("SVM_MODE", "exact"), **options})
+
+
+def _load_attacks(**options):
+    shared_dir = os.getenv(SHARED_DIR_ENV)
+    if shared_dir and not options:
+        return AttackGenerator.from_arrays(open_arrays(shared_dir))
+    return AttackGenerator(**options)
+
+
+def _backend(model: str) -> str:
+    """LSTM_BACKEND / BATTERY_BACKEND, falling back to INFERENCE_BACKEND"""
+    return os.getenv(f"{model.upper()}_BACKEND", os.getenv("INFERENCE_BACKEND", "keras"))
+
+
+def _load_lstm(**options):
+    detector = LSTMDetector(**{"backend": _backend("lstm"), **options})
+    detector.warmup()
+    return detector
+
+
+def _load_battery(**options):
+    detector = BatteryDetector(**{"backend": _backend("battery"), **options})
+    detector.warmup()
+    return detector
+
+
+LOADERS = {
+    "svm": _load_svm,
+    "attacks": _load_attacks,
+    "lstm": _load_lstm,
+    "battery": _load_battery
+}
+
+# Constructor options an admin load may set, per model. Paths are
+# unpickled or written to, so they must resolve inside PATH_ROOTS.
+LOAD_OPTIONS = {
+    "svm": {"dataset_path", "artifact_dir", "params", "rebuild", "mode", "approx_params"},
+    "attacks": {"dataset_path", "interval_us"},
+    "lstm": {"model_path", "dataset_path", "recalibrate", "chunk_size", "backend"},
+    "battery": {"model_path", "scaler_path", "backend"}
+}
+BACKEND_DIR = Path(__file__).resolve().parent
+PATH_ROOTS = {
+    "model_path": BACKEND_DIR / "models",
+    "scaler_path": BACKEND_DIR / "models",
+    "artifact_dir": BACKEND_DIR / "models",
+    "dataset_path": BACKEND_DIR / "data"
+}
+
+
+def _load_options(name: str, options: dict) -> dict:
+    """Allowed constructor options with paths resolved; ValueError otherwise"""
+    unknown = set(options) - LOAD_OPTIONS[name]
+    if unknown:
+        raise ValueError(
+            f"Unsupported options for {name}: {', '.join(sorted(unknown))} "
+            f"(choose from {', '.join(sorted(LOAD_OPTIONS[name]))})"
+        )
+    resolved = dict(options)
+    for key, root in PATH_ROOTS.items():
+        if key not in options:
+            continue
+        if not isinstance(options[key], str):
+            raise ValueError(f"{key} must be a string")
+        # Relative paths are relative to backend/, like the constructor defaults
+        path = (BACKEND_DIR / options[key]).resolve()
+        if not path.is_relative_to(root):
+            raise ValueError(f"{key} must be inside {root.relative_to(BACKEND_DIR)}/")
+        resolved[key] = str(path)
+    return resolved
+
+
+def _load_online():
+    # Refits start from the served SVM, so wait for it first
+    slot = models["svm"]
+    if not slot.wait():
+        raise RuntimeError("svm model failed to load")
+    # The online lineage starts at the version serving now. Once an admin
+    # activates or rolls back to another version, refits pause and are
+    # never activated over that choice; reactivating the lineage resumes them.
+    lineage = {"head": slot.active}
+
+    def publish(detector, version: str):
+        live = slot.active == lineage["head"]
+        slot.publish(version, detector, activate=live)
+        if live:
+            lineage["head"] = version
+
+    trainer = OnlineTrainer(
+        current=lambda: slot.instance,
+        swap=publish,
+        capacity=int(os.getenv("ONLINE_RESERVOIR", "10000")),
+        min_new=int(os.getenv("ONLINE_MIN_NEW", "1000")),
+        min_interval_s=float(os.getenv("ONLINE_MIN_INTERVAL_S", "30")),
+        live=lambda: slot.active == lineage["head"]
+    )
+    trainer.start()
+    return trainer
+
+
+def loaded(name: str):
+    """The ready model instance, or a 503 while it is still loading"""
+    if name not in models:
+        raise HTTPException(status_code=404, detail=f"{name} is not enabled")
+    model = models[name]
+    if not model.ready:
+        detail = f"{name} model failed to load" if model.state == "failed" else f"{name} model is still loading"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "5"})
+    return model.instance
+
 
-# Global model instances
-svm_detector = None
-lstm_detector = None
-battery_detector = None
-attack_generator = None
+# Batch routes take a JSON list of readings or packed binary frames
+READINGS_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": {"type": "array", "items": {"$ref": "#/components/schemas/SensorReading"}}
+            },
+            FRAME_CONTENT_TYPE: {
+                "schema": {"type": "string", "format": "binary"},
+                "example": "9 little-endian float64 per reading, in SensorReading.to_array() order"
+            }
+        }
+    }
+}
+
+
+def _invalid_body(error: FrameError | ValidationError, *loc) -> RequestValidationError:
+    """422 for a FrameError or ValidationError at body.<loc>"""
+    errors = error.errors if isinstance(error, FrameError) else error.errors(include_url=False)
+    return RequestValidationError([{**e, "loc": ["body", *loc, *e["loc"]]} for e in errors])
+
+
+# /api/detect parses its body itself (see detect_request); SensorReading
+# is already a component through the single-reading route
+DETECT_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": {
+                    key: value
+                    for key, value in DetectRequest.model_json_schema(ref_template="#/components/schemas/{model}").items()
+                    if key != "$defs"
+                }
+            }
+        }
+    }
+}
+
+
+async def sensor_readings(request: Request) -> np.ndarray:
+    """(n, 9) readings in canonical feature order from either body format"""
+    body = await request.body()
+    binary = request.headers.get("content-type", "").split(";")[0].strip() == FRAME_CONTENT_TYPE
+    try:
+        return decode_frames(body) if binary else parse_readings(body)
+    except (FrameError, ValidationError) as e:
+        raise _invalid_body(e)
+
+
+async def detect_request(request: Request) -> tuple[DetectOptions, np.ndarray]:
+    """Options and (n, 9) readings block of a /api/detect body, readings through `readings_matrix`"""
+    body = await request.body()
+    try:
+        payload = json_loads(body)
+    except ValueError:
+        payload = None
+    readings = payload.get("readings") if isinstance(payload, dict) else None
+    try:
+        if isinstance(readings, list) and readings:
+            options = DetectOptions.model_validate({k: v for k, v in payload.items() if k != "readings"})
+        else:
+            # JSON the fast parser rejects (e.g. 1e999), or missing / empty
+            # readings: full Pydantic validation accepts it or names the problem
+            options = DetectRequest.model_validate_json(body)
+            readings = options.readings
+    except ValidationError as e:
+        raise _invalid_body(e)
+    try:
+        return options, readings_matrix(readings)
+    except (FrameError, ValidationError) as e:
+        raise _invalid_body(e, "readings")
+
+
+def _publish_fleet_alerts(result: dict):
+    """Send each anomalous fleet verdict to its vehicle's connection"""
+    for i in np.flatnonzero(result["is_anomaly"]):
+        queue = fleet_subscribers.get(result["vehicle_ids"][i])
+        if queue is None or queue.full():
+            continue
+        svm_score, lstm_error, battery_score = result["svm_score"][i], result["lstm_error"][i], result["battery_score"][i]
+        queue.put_nowait({
+            "timestamp": float(result["timestamp"][i]),
+            "is_anomaly": True,
+            "svm_score": None if np.isnan(svm_score) else float(svm_score),
+            "lstm_error": None if np.isnan(lstm_error) else float(lstm_error),
+            "battery_score": None if np.isnan(battery_score) else float(battery_score),
+            "flood": bool(result["flood"][i]),
+            "replay": bool(result["replay"][i]),
+            "latency_ms": round(float(result["latency_s"][i]) * 1000, 2)
+        })
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Load ML models on startup"""
-    global svm_detector, lstm_detector, battery_detector, attack_generator
+    """Start loading ML models in the background and serve immediately"""
+    global models, inference_scheduler, shadow_scorer, fleet_processor, score_caches, cascade, timing_detector
+    
+    print("🚀 Loading ML models in the background...")
+    # The cheap SVM and dataset are listed first so they are ready within
+    # a second or two; TensorFlow is only imported by the Keras loaders
+    models = {}
+    for name, loader in LOADERS.items():
+        models[name] = ModelSlot(name, keep=int(os.getenv("MODEL_VERSIONS_KEPT", "2")))
+        models[name].load("initial", loader, activate=True)
+    # Online retraining is per process, so it is off when workers share
+    # one read-only copy of the model arrays
+    if not os.getenv(SHARED_DIR_ENV) and os.getenv("ONLINE_RETRAIN", "0") == "1":
+        models["online"] = LazyModel("online", _load_online)
+        models["online"].start()
+    
+    # Concurrent LSTM / battery requests share batched forward passes.
+    # Each item carries the score_windows of the version that prepared it.
+    inference_scheduler = InferenceScheduler(
+        max_batch_size=int(os.getenv("INFERENCE_MAX_BATCH", "64")),
+        max_wait_ms=float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+    )
+    inference_scheduler.register("lstm")
+    inference_scheduler.register("battery")
+    inference_scheduler.start()
+    
+    # Repeated readings / windows (replay and flood traffic) reuse their scores
+    ttl_s = float(os.getenv("SCORE_CACHE_TTL_S", "300"))
+    score_caches = {
+        name: ScoreCache(
+            name,
+            max_entries=int(os.getenv("SCORE_CACHE_SIZE", "100000")),
+            ttl_s=ttl_s or None,
+            quantum=float(os.getenv("SCORE_CACHE_QUANTUM", "1e-3"))
+        )
+        for name in ("svm", "lstm", "battery")
+    }
+    
+    # Streams only send readings on to the heavy models when cheap checks can't
+    # clear them. Opt-in: screened frames carry no score (null in the reply)
+    cascade = None
+    if os.getenv("CASCADE", "0") == "1":
+        cascade = Cascade(
+            z_gates={
+                "lstm": float(os.getenv("CASCADE_LSTM_Z_GATE", "1.5")),
+                "battery": float(os.getenv("CASCADE_BATTERY_Z_GATE", "0"))
+            },
+            sample_rate=float(os.getenv("CASCADE_SAMPLE_RATE", "0.05")),
+            min_interval_s=float(os.getenv("CASCADE_MIN_INTERVAL_S", "0"))
+        )
     
-    print("🚀 Loading ML models...")
-    svm_detector = SVMDetector()
-    lstm_detector = LSTMDetector()
-    battery_detector = BatteryDetector()
-    attack_generator = AttackGenerator()
-    print("✅ Models loaded successfully!")
+    # Floods and replays show in arrival timing, which none of the models see
+    timing_detector = None
+    if os.getenv("TIMING", "1") == "1":
+        timing_detector = TimingDetector(
+            max_rate_hz=float(os.getenv("TIMING_MAX_RATE_HZ", "1000")),
+            window=int(os.getenv("TIMING_WINDOW", "128")),
+            history=int(os.getenv("TIMING_HISTORY", "256")),
+            max_repeat_share=float(os.getenv("TIMING_MAX_REPEAT_SHARE", "0.5")),
+            max_streams=int(os.getenv("TIMING_MAX_STREAMS", "10000"))
+        )
+    
+    # Candidate versions are compared against live traffic off the request path
+    shadow_scorer = ShadowScorer(max_queue=int(os.getenv("SHADOW_MAX_QUEUE", "1000")))
+    shadow_scorer.start()
+    
+    # Fleet streams are scored together on a fixed tick instead of per frame
+    fleet_processor = FleetProcessor(
+        svm=lambda: models["svm"].instance,
+        lstm=lambda: models["lstm"].instance,
+        battery=lambda: models["battery"].instance,
+        tick_ms=float(os.getenv("FLEET_TICK_MS", "100")),
+        max_pending=int(os.getenv("FLEET_MAX_PENDING", "16")),
+        policy=os.getenv("FLEET_POLICY", "block"),
+        window_stride=int(os.getenv("FLEET_WINDOW_STRIDE", "1")),
+        on_result=_publish_fleet_alerts,
+        caches=score_caches,
+        cascade=cascade,
+        timing=timing_detector
+    )
+    fleet_processor.start()
     
     yield
     
     print("🔴 Shutting down...")
+    if "online" in models and models["online"].ready:
+        models["online"].instance.stop()
+    await inference_scheduler.stop()
+    shadow_scorer.stop()
+    await fleet_processor.stop()
 
 
 app = FastAPI(
@@ -67,20 +386,25 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    """Detailed health check"""
+    """Per-model readiness and load time"""
+    statuses = {name: model.status() for name, model in models.items()}
+    if all(s["ready"] for s in statuses.values()):
+        status = "healthy"
+    elif any(s["state"] == "failed" for s in statuses.values()):
+        status = "degraded"
+    else:
+        status = "starting"
+    
     return {
-        "status": "healthy",
-        "models": {
-            "svm": svm_detector is not None,
-            "lstm": lstm_detector is not None,
-            "battery": battery_detector is not None
-        }
+        "status": status,
+        "models": statuses
     }
 
 
 @app.post("/api/attacks/generate")
 async def generate_attack(request: AttackRequest):
     """Generate synthetic attack data"""
+    attack_generator = loaded("attacks")
     try:
         attack_data = attack_generator.generate(
             attack_type=request.attack_type,
@@ -90,7 +414,7 @@ async def generate_attack(request: AttackRequest):
         return {
             "success": True,
             "attack_type": request.attack_type,
-            "samples": attack_data,
+            "samples": attack_data.to_columns() if request.format == "columns" else attack_data.to_records(),
             "count": len(attack_data)
         }
     except Exception as e:
@@ -100,11 +424,66 @@ async def generate_attack(request: AttackRequest):
         )
 
 
+async def paced_attack_batches(request: AttackStreamRequest):
+    """
+    Attack batches at the requested rate, produced only on demand
+    
+    The caller awaits each send before asking for the next batch, so a slow
+    consumer stalls generation instead of piling frames up in memory. When
+    pacing falls behind by more than a second the schedule restarts rather
+    than bursting to catch up.
+    """
+    if request.rate:
+        # Roughly 20 sends per second at the target rate
+        chunk_size = max(1, min(request.chunk_size, int(request.rate / 20)))
+        interval_us = max(1, int(1_000_000 / request.rate))
+    else:
+        chunk_size, interval_us = request.chunk_size, None
+    
+    batches = loaded("attacks").stream(
+        request.attack_type, chunk_size=chunk_size, total=request.total, interval_us=interval_us
+    )
+    started, sent = time.perf_counter(), 0
+    for batch in batches:
+        if request.rate:
+            lag = time.perf_counter() - (started + sent / request.rate)
+            if lag > 1.0:
+                started, sent = time.perf_counter(), 0
+            elif lag < 0:
+                await asyncio.sleep(-lag)
+        else:
+            # Let other requests run between unpaced batches
+            await asyncio.sleep(0)
+        yield batch
+        sent += len(batch)
+
+
+@app.post("/api/attacks/stream")
+async def stream_attack(request: AttackStreamRequest):
+    """Stream synthetic attack traffic as NDJSON, one sample per line"""
+    loaded("attacks")
+    
+    async def ndjson():
+        async for batch in paced_attack_batches(request):
+            yield "".join(json.dumps(record) + "\n" for record in batch.to_records())
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
 @app.post("/api/anomaly/detect-svm")
-async def detect_svm(reading: SensorReading):
+async def detect_svm(
+    reading: SensorReading,
+    attribution: AttributionMethod = "zscore",
+    top_k: int | None = Query(None, ge=1)
+):
     """Real-time anomaly detection using One-Class SVM with feature importance"""
+    svm_detector = loaded("svm")
     try:
-        prediction, score, importance = svm_detector.detect(reading.to_array())
+        started = time.perf_counter()
+        prediction, score, importance = svm_detector.detect(reading.to_array(), attribution, top_k, score_caches["svm"])
+        shadow_scorer.offer(
+            "svm", models["svm"], [reading.to_array()], [score], [prediction == 1], time.perf_counter() - started
+        )
         
         return {
             "success": True,
@@ -122,9 +501,81 @@ async def detect_svm(reading: SensorReading):
         )
 
 
-@app.post("/api/anomaly/detect-lstm")
-async def detect_lstm(readings: list[SensorReading]):
+def _batch_importance(detector, result: dict, top_k: int | None) -> dict:
+    """
+    Columnar feature importance: full (n, features) matrices, or with
+    `top_k` the per-reading feature indices and (n, k) values in rank order
+    """
+    matrices = {key: result[key] for key in ("z_scores", "contributions", "attributions") if key in result}
+    importance = {"features": detector.feature_names}
+    if top_k is not None:
+        indices = rank_features(result.get("attributions", result["contributions"]), top_k)
+        importance["indices"] = indices.tolist()
+        matrices = {key: np.take_along_axis(values, indices, axis=1) for key, values in matrices.items()}
+    importance.update((key, values.tolist()) for key, values in matrices.items())
+    return importance
+
+
+@app.post("/api/anomaly/detect-svm/batch", openapi_extra=READINGS_BODY)
+async def detect_svm_batch(
+    readings: np.ndarray = Depends(sensor_readings),
+    attribution: AttributionMethod = "zscore",
+    top_k: int | None = Query(None, ge=1),
+    vehicle_id: str | None = Query(None, description="Continue this stream's timing state across batches")
+):
+    """Score many readings with the One-Class SVM in a single vectorized pass"""
+    svm_detector = loaded("svm")
+    try:
+        if not len(readings):
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Batch must contain at least one reading"}
+            )
+        
+        started = time.perf_counter()
+        result = svm_detector.detect_batch(readings, attribution, score_caches["svm"])
+        scores = result["anomaly_scores"]
+        shadow_scorer.offer(
+            "svm", models["svm"], readings, scores, result["predictions"] == 1, time.perf_counter() - started
+        )
+        
+        # Columnar response: one list per field instead of one object per reading
+        response = {
+            "success": True,
+            "method": "One-Class SVM",
+            "count": len(readings),
+            "is_anomaly": (result["predictions"] == 1).tolist(),
+            "anomaly_score": scores.tolist(),
+            "confidence": np.minimum(np.abs(scores) / 100.0, 1.0).tolist(),
+            "timestamp": readings[:, 0].tolist(),
+            "feature_importance": _batch_importance(svm_detector, result, top_k)
+        }
+        if timing_detector is not None:
+            flags = timing_detector.observe(readings, vehicle_id)
+            response["timing"] = {
+                **timing_detector.summary(flags),
+                "flood": flags["flood"].tolist(),
+                "replay": flags["replay"].tolist()
+            }
+        return response
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "error": str(e)}
+        )
+
+
+def _score_window(name: str, detector, window: np.ndarray):
+    """Error of a prepared LSTM / battery window: cached, or one batched forward pass"""
+    return score_caches[name].score_window(
+        detector, window, lambda: inference_scheduler.submit(name, window, detector.score_windows)
+    )
+
+
+@app.post("/api/anomaly/detect-lstm", openapi_extra=READINGS_BODY)
+async def detect_lstm(readings: np.ndarray = Depends(sensor_readings)):
     """LSTM Autoencoder anomaly detection"""
+    lstm_detector = loaded("lstm")
     try:
         if len(readings) < 10:
             return JSONResponse(
@@ -132,20 +583,14 @@ async def detect_lstm(readings: list[SensorReading]):
                 content={"error": "LSTM requires at least 10 sequential readings"}
             )
         
-        sequence = []
-        for r in readings[-10:]:
-            sequence.append([
-                r.datetime,
-                r.accelerometer1_rms,
-                r.accelerometer2_rms,
-                r.current,
-                r.pressure,
-                r.temperature,
-                r.thermocouple,
-                r.volume_flow_rate_rms
-            ])
-
-        is_anomaly, reconstruction_error = lstm_detector.detect(sequence)
+        sequence = readings[-10:, LSTM_COLUMNS]
+        started = time.perf_counter()
+        window = lstm_detector.prepare(sequence)
+        reconstruction_error = await _score_window("lstm", lstm_detector, window)
+        is_anomaly = reconstruction_error > lstm_detector.threshold
+        shadow_scorer.offer(
+            "lstm", models["lstm"], sequence, [reconstruction_error], [is_anomaly], time.perf_counter() - started
+        )
 
         return {
             "success": True,
@@ -161,9 +606,10 @@ async def detect_lstm(readings: list[SensorReading]):
         )
 
 
-@app.post("/api/battery/detect")
-async def detect_battery_spoofing(readings: list[SensorReading]):
+@app.post("/api/battery/detect", openapi_extra=READINGS_BODY)
+async def detect_battery_spoofing(readings: np.ndarray = Depends(sensor_readings)):
     """Battery voltage spoofing detection"""
+    battery_detector = loaded("battery")
     try:
         if len(readings) < 10:
             return JSONResponse(
@@ -171,8 +617,14 @@ async def detect_battery_spoofing(readings: list[SensorReading]):
                 content={"error": "Battery detection requires at least 10 readings"}
             )
         
-        voltage_sequence = [(r.datetime, r.voltage) for r in readings[-10:]]
-        is_anomaly, score = battery_detector.detect(voltage_sequence)
+        voltage_sequence = readings[-10:, BATTERY_COLUMNS]
+        started = time.perf_counter()
+        window = battery_detector.prepare(voltage_sequence)
+        score = await _score_window("battery", battery_detector, window)
+        is_anomaly = score > battery_detector.threshold
+        shadow_scorer.offer(
+            "battery", models["battery"], voltage_sequence, [score], [is_anomaly], time.perf_counter() - started
+        )
 
         return {
             "success": True,
@@ -187,9 +639,303 @@ async def detect_battery_spoofing(readings: list[SensorReading]):
         )
 
 
+async def _detect_svm(detector, block: np.ndarray, attribution: str, top_k: int | None) -> dict:
+    """SVM verdict and feature importance for the latest reading of `block`"""
+    started = time.perf_counter()
+    prediction, score, importance = await asyncio.to_thread(
+        detector.detect, block[-1], attribution, top_k, score_caches["svm"]
+    )
+    shadow_scorer.offer("svm", models["svm"], block[-1:], [score], [prediction == 1], time.perf_counter() - started)
+    return {
+        "is_anomaly": prediction == 1,
+        "anomaly_score": float(score),
+        "confidence": min(abs(float(score)) / 100.0, 1.0),
+        "feature_importance": importance
+    }
+
+
+async def _detect_sequence(name: str, detector, sequence: np.ndarray) -> dict:
+    """LSTM / battery verdict for the last seq_len rows of `sequence`"""
+    started = time.perf_counter()
+    window = detector.prepare(sequence)
+    error = await _score_window(name, detector, window)
+    is_anomaly = error > detector.threshold
+    shadow_scorer.offer(name, models[name], sequence, [error], [is_anomaly], time.perf_counter() - started)
+    if name == "lstm":
+        return {
+            "is_anomaly": bool(is_anomaly),
+            "reconstruction_error": float(error),
+            "threshold": float(detector.threshold)
+        }
+    return {"is_anomaly": bool(is_anomaly), "anomaly_score": float(error)}
+
+
+@app.post("/api/detect", openapi_extra=DETECT_BODY)
+async def detect(parsed: tuple[DetectOptions, np.ndarray] = Depends(detect_request)):
+    """
+    Run several detectors on the same readings in one request
+    
+    Readings are validated once, on the same fast path as the list routes,
+    and converted to a single NumPy block;
+    each model takes its columns from it and all selected models run
+    concurrently. Models that are still loading, or sequence models given
+    fewer than 10 readings, are reported under `skipped` instead of
+    failing the request. "timing" checks the readings' own arrival timing
+    for floods and replays.
+    """
+    request, block = parsed
+    selected = list(dict.fromkeys(request.models))
+    scored = [name for name in selected if name != "timing"]
+    ready = {name: models[name].instance for name in scored if models[name].ready}
+    if scored and not ready:
+        loaded(scored[0])  # 503 with Retry-After
+    try:
+        skipped = {name: models[name].state for name in scored if name not in ready}
+        pending = {}
+        for name, detector in ready.items():
+            if name == "svm":
+                pending[name] = _detect_svm(detector, block, request.attribution, request.top_k)
+            elif len(block) < detector.seq_len:
+                skipped[name] = f"needs {detector.seq_len} readings"
+            else:
+                columns = LSTM_COLUMNS if name == "lstm" else BATTERY_COLUMNS
+                pending[name] = _detect_sequence(name, detector, block[-detector.seq_len:, columns])
+        results = dict(zip(pending, await asyncio.gather(*pending.values())))
+        if "timing" in selected:
+            if timing_detector is None:
+                skipped["timing"] = "disabled"
+            else:
+                results["timing"] = timing_detector.summary(timing_detector.observe(block))
+        
+        return {
+            "success": True,
+            "count": len(block),
+            "timestamp": float(block[-1, 0]),
+            "is_anomaly": any(result["is_anomaly"] for result in results.values()),
+            "models": {name: results.get(name) for name in selected},
+            "skipped": skipped
+        }
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "error": str(e)}
+        )
+
+
+@app.get("/api/models/svm")
+async def svm_info():
+    """Scoring mode of the SVM and, when approximate, its measured agreement"""
+    svm_detector = loaded("svm")
+    return {
+        "mode": svm_detector.mode,
+        "support_vectors": len(svm_detector.model.support_vectors_),
+        "approximation": svm_detector.approximation
+    }
+
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    """Admin routes need X-Admin-Token matching ADMIN_TOKEN; without ADMIN_TOKEN they are disabled"""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled (set ADMIN_TOKEN)")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def single_process():
+    """Model changes reach only the worker that handles them, so they are refused under `manage.py serve`"""
+    if os.getenv(SHARED_DIR_ENV):
+        raise HTTPException(
+            status_code=409,
+            detail="Model versions are per worker; restart the workers to change what they serve"
+        )
+
+
+@app.post("/api/feedback/normal", openapi_extra=READINGS_BODY, dependencies=[Depends(require_admin)])
+async def feedback_normal(readings: np.ndarray = Depends(sensor_readings)):
+    """Confirmed-normal readings for online retraining of the SVM (admin only: they retrain the live model)"""
+    trainer = loaded("online")
+    try:
+        if not len(readings):
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Feedback must contain at least one reading"}
+            )
+        
+        kept = trainer.add(readings)
+        return {
+            "success": True,
+            "accepted": len(readings),
+            "kept_in_reservoir": kept,
+            **trainer.status()
+        }
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "error": str(e)}
+        )
+
+
+@app.get("/api/online/status")
+async def online_status():
+    """Reservoir size, pending feedback and refit history of the online SVM"""
+    return loaded("online").status()
+
+
+def _slot(name: str) -> ModelSlot:
+    if name not in LOADERS:
+        raise HTTPException(status_code=404, detail=f"Unknown model '{name}' (choose from {', '.join(LOADERS)})")
+    return models[name]
+
+
+@app.get("/api/admin/models", dependencies=[Depends(require_admin)])
+async def list_model_versions():
+    """Every version of every model, which is active and which are draining"""
+    return {name: models[name].status() for name in LOADERS}
+
+
+@app.post("/api/admin/models/{name}/load", dependencies=[Depends(require_admin), Depends(single_process)])
+async def load_model_version(name: str, request: ModelLoadRequest):
+    """
+    Load a new version in the background (e.g. a retrained .h5 or SVM artifact)
+    
+    `options` are constructor arguments from LOAD_OPTIONS, such as
+    model_path, artifact_dir or backend; paths must stay inside
+    backend/models/ (datasets inside backend/data/). The version is warmed
+    up before it can be activated; with `activate` it goes live as soon as
+    it is ready.
+    """
+    slot = _slot(name)
+    try:
+        options = _load_options(name, request.options)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
+    
+    try:
+        slot.load(request.version, lambda: LOADERS[name](**options), activate=request.activate)
+    except ValueError as e:
+        return JSONResponse(status_code=409, content={"success": False, "error": str(e)})
+    return {"success": True, **slot.status()}
+
+
+@app.post("/api/admin/models/{name}/activate", dependencies=[Depends(require_admin), Depends(single_process)])
+async def activate_model_version(name: str, request: ModelVersionRequest):
+    """Route new requests to a loaded version; in-flight requests finish on the old one"""
+    slot = _slot(name)
+    try:
+        slot.activate(request.version)
+    except KeyError as e:
+        return JSONResponse(status_code=404, content={"success": False, "error": str(e.args[0])})
+    except ValueError as e:
+        return JSONResponse(status_code=409, content={"success": False, "error": str(e)})
+    return {"success": True, **slot.status()}
+
+
+@app.post("/api/admin/models/{name}/rollback", dependencies=[Depends(require_admin), Depends(single_process)])
+async def rollback_model_version(name: str):
+    """Reactivate the previously active version"""
+    slot = _slot(name)
+    try:
+        slot.rollback()
+    except ValueError as e:
+        return JSONResponse(status_code=409, content={"success": False, "error": str(e)})
+    return {"success": True, **slot.status()}
+
+
+@app.delete("/api/admin/models/{name}/versions/{version}", dependencies=[Depends(require_admin), Depends(single_process)])
+async def unload_model_version(name: str, version: str):
+    """Drop an inactive version; its memory is freed once nothing still uses it"""
+    slot = _slot(name)
+    try:
+        slot.unload(version)
+    except KeyError as e:
+        return JSONResponse(status_code=404, content={"success": False, "error": str(e.args[0])})
+    except ValueError as e:
+        return JSONResponse(status_code=409, content={"success": False, "error": str(e)})
+    return {"success": True, **slot.status()}
+
+
+@app.put("/api/admin/models/{name}/shadow", dependencies=[Depends(require_admin), Depends(single_process)])
+async def start_shadow(name: str, request: ModelVersionRequest):
+    """Score a loaded, inactive version alongside the active one on live requests"""
+    slot = _slot(name)
+    if name == "attacks":
+        return JSONResponse(status_code=400, content={"success": False, "error": "The attack generator has no scores to compare"})
+    try:
+        slot.set_shadow(request.version)
+    except KeyError as e:
+        return JSONResponse(status_code=404, content={"success": False, "error": str(e.args[0])})
+    except ValueError as e:
+        return JSONResponse(status_code=409, content={"success": False, "error": str(e)})
+    return {"success": True, **slot.status()}
+
+
+@app.delete("/api/admin/models/{name}/shadow", dependencies=[Depends(require_admin), Depends(single_process)])
+async def stop_shadow(name: str):
+    """Stop shadow scoring; the comparison so far stays in /api/metrics/shadow"""
+    slot = _slot(name)
+    slot.set_shadow(None)
+    return {"success": True, **slot.status()}
+
+
+@app.get("/api/metrics/shadow")
+async def shadow_metrics():
+    """Disagreement and latency deltas of each shadow candidate against the live model"""
+    return shadow_scorer.metrics()
+
+
+@app.get("/api/metrics/cache")
+async def cache_metrics():
+    """Size, hit rate and evictions of each model's score cache"""
+    return {name: cache.metrics() for name, cache in score_caches.items()}
+
+
+@app.get("/api/metrics/cascade")
+async def cascade_metrics():
+    """Per-tier pass rates of the stream detection cascade"""
+    if cascade is None:
+        return {"enabled": False}
+    return {"enabled": True, **cascade.metrics()}
+
+
+@app.get("/api/metrics/timing")
+async def timing_metrics(vehicle_id: str | None = None):
+    """Flood / replay counts of the arrival-timing detector, overall or for one stream"""
+    if timing_detector is None:
+        return {"enabled": False}
+    if vehicle_id is None:
+        return {"enabled": True, **timing_detector.metrics()}
+    stream = timing_detector.stream(vehicle_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail=f"No timing state for stream '{vehicle_id}'")
+    return stream
+
+
+@app.get("/api/fleet/status")
+async def fleet_status():
+    """Streams, sustained frames/s, p50/p99 latency and frames shed by the fleet processor"""
+    return fleet_processor.metrics()
+
+
+@app.get("/api/fleet/vehicles/{vehicle_id}")
+async def fleet_vehicle(vehicle_id: str):
+    """Frame, anomaly and shed counters of one fleet stream"""
+    status = fleet_processor.vehicle(vehicle_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"No fleet stream for vehicle '{vehicle_id}'")
+    return status
+
+
+@app.get("/api/metrics/inference")
+async def inference_metrics():
+    """Queue depth, batch size and wait time for the micro-batching scheduler"""
+    return inference_scheduler.metrics()
+
+
 @app.get("/api/data/sample")
 async def get_sample_data(n: int = 10):
     """Get random sample from CAN.csv"""
+    attack_generator = loaded("attacks")
     try:
         samples = attack_generator.get_normal_samples(n)
         return {
@@ -204,24 +950,64 @@ async def get_sample_data(n: int = 10):
         )
 
 
+def _decode_message(message: dict) -> np.ndarray:
+    """
+    (n, 9) readings of one WebSocket message: binary frames or one JSON reading
+
+    Anything but a JSON object (a list, a number, bad JSON) raises
+    ValidationError; non-finite values raise FrameError.
+    """
+    if message.get("bytes") is not None:
+        return decode_frames(message["bytes"])
+    frames = np.array([SensorReading.model_validate_json(message["text"]).to_array()])
+    check_finite(frames)
+    return frames
+
+
 @app.websocket("/ws/realtime")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket for real-time streaming"""
+async def websocket_endpoint(websocket: WebSocket, vehicle_id: str = "default"):
+    """
+    WebSocket for real-time streaming
+    
+    Send one reading per message; the connection keeps the recent window
+    for the sequence models, so every reply is a combined SVM / LSTM /
+    battery verdict without resending history. The sequence models join
+    the session once they finish loading; until then they report null.
+    
+    Binary messages carry one or more packed frames (see utils/frames.py)
+    instead of JSON and get one reply per frame.
+    """
     await websocket.accept()
+    if not models["svm"].ready:
+        # 1013: try again later
+        await websocket.close(code=1013, reason="svm model is still loading")
+        return
+    session = StreamSession(
+        vehicle_id, models["svm"].instance, inference_scheduler,
+        caches=score_caches, cascade=cascade, timing=timing_detector
+    )
     
     try:
         while True:
-            data = await websocket.receive_json()
-            reading = SensorReading(**data)
-            
-            prediction, score = svm_detector.detect(reading.to_array())
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            try:
+                frames = _decode_message(message)
+            except ValidationError as e:
+                await websocket.send_json({"error": e.errors(include_url=False)})
+                continue
+            except (FrameError, ValueError) as e:
+                await websocket.send_json({"error": getattr(e, "errors", str(e))})
+                continue
             
-            await websocket.send_json({
-                "timestamp": reading.datetime,
-                "is_anomaly": prediction == 1,
-                "score": float(score),
-                "severity": "high" if score > 80 else "medium" if score > 60 else "low"
-            })
+            session.use_svm(models["svm"].instance)
+            for name in ("lstm", "battery"):
+                if models[name].ready:
+                    session.attach(name, models[name].instance)
+            for frame in frames:
+                verdict = await session.process(frame)
+                await websocket.send_json({"timestamp": float(frame[0]), **verdict})
             
     except WebSocketDisconnect:
         print("Client disconnected")
@@ -230,6 +1016,82 @@ async def websocket_endpoint(websocket: WebSocket):
         await websocket.close()
 
 
+@app.websocket("/ws/fleet")
+async def fleet_websocket(websocket: WebSocket, vehicle_id: str):
+    """
+    One vehicle's feed into the shared fleet processor
+    
+    Accepts the same JSON readings or binary frames as /ws/realtime, but
+    frames are scored in cross-vehicle batches on the processor's tick
+    and only anomalies are sent back. Under the default "block" policy a
+    vehicle that sends faster than it is scored stops being read, which
+    pushes back on that connection alone.
+    """
+    await websocket.accept()
+    if vehicle_id in fleet_subscribers:
+        await websocket.close(code=1008, reason=f"vehicle '{vehicle_id}' is already connected")
+        return
+    alerts = fleet_subscribers[vehicle_id] = asyncio.Queue(maxsize=100)
+    
+    async def send_alerts():
+        while True:
+            await websocket.send_json({"vehicle_id": vehicle_id, **await alerts.get()})
+    
+    sender = asyncio.create_task(send_alerts())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                frames = _decode_message(message)
+            except ValidationError as e:
+                await websocket.send_json({"error": e.errors(include_url=False)})
+                continue
+            except (FrameError, ValueError) as e:
+                await websocket.send_json({"error": getattr(e, "errors", str(e))})
+                continue
+            for frame in frames:
+                await fleet_processor.put(vehicle_id, frame)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Fleet WebSocket error: {e}")
+    finally:
+        sender.cancel()
+        fleet_subscribers.pop(vehicle_id, None)
+        fleet_processor.remove(vehicle_id)
+
+
+@app.websocket("/ws/attacks")
+async def attack_stream_websocket(websocket: WebSocket):
+    """
+    WebSocket attack traffic stream
+    
+    The first message is an AttackStreamRequest; every reply after that is
+    one batch of samples in columnar form.
+    """
+    await websocket.accept()
+    if not models["attacks"].ready:
+        await websocket.close(code=1013, reason="attacks model is still loading")
+        return
+    
+    try:
+        try:
+            request = AttackStreamRequest(**await websocket.receive_json())
+        except ValidationError as e:
+            await websocket.send_json({"error": e.errors(include_url=False)})
+            await websocket.close()
+            return
+        
+        async for batch in paced_attack_batches(request):
+            await websocket.send_json({"count": len(batch), "samples": batch.to_columns()})
+        await websocket.close()
+        
+    except WebSocketDisconnect:
+        print("Attack stream client disconnected")
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "app:app",
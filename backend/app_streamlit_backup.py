@@ -18,9 +18,19 @@ from streamlit_lottie import st_lottie
 import matplotlib.pyplot as plt
 import requests
 import pickle
+from utils.windows import sliding_windows, window_batches
 
 # Load dataset (make sure the file is in the same directory or provide a full path)
 df = pd.read_csv("CAN.csv")  # Change this to your actual dataset filename
+def window_errors(model, windows):
+    """Mean absolute reconstruction error per window; none when there are no windows"""
+    if len(windows) == 0:
+        return np.empty(0)
+    return np.concatenate([
+        np.mean(np.abs(model.predict(batch, verbose=0) - batch), axis=(1, 2))
+        for _, batch in window_batches(windows, 1024)
+    ])
+
 def load_lottieurl(url):
     try:
         response = requests.get(url)
@@ -268,10 +278,8 @@ elif st.session_state.page == 'dashboard':
         scaler = StandardScaler()
         data_scaled = scaler.fit_transform(data)
         SEQ_LEN = 10
-        X = []
-        for i in range(len(data_scaled) - SEQ_LEN):
-            X.append(data_scaled[i: i + SEQ_LEN])
-        X = np.array(X)
+        # Training needs the full tensor; build it from the strided view in one copy
+        X = np.ascontiguousarray(sliding_windows(data_scaled, SEQ_LEN)[:-1])
         split = int(0.8 * len(X))
         X_train, X_test = X[:split], X[split:]
         model = Sequential([
@@ -439,64 +447,61 @@ elif st.session_state.page == 'dashboard':
 
                 # Test Data Input (Simulating X_test)
                 SEQ_LEN = 10  # Example sequence length for LSTM input
-                X_test = []
-                
-                for i in range(len(data_scaled) - SEQ_LEN):
-                    X_test.append(data_scaled[i: i + SEQ_LEN])
-                
-                X_test = np.array(X_test)
+                X_test = sliding_windows(data_scaled, SEQ_LEN)[:-1]
 
                 # Calculate reconstruction error using the loaded model
                 st.subheader("Anomaly Detection")
                 
                 if st.button("Detect Anomalies"):
-                    X_test_pred = model.predict(X_test)
-                    reconstruction_error = np.mean(np.abs(X_test_pred - X_test), axis=(1, 2))
+                    reconstruction_error = window_errors(model, X_test)
 
-                    # Set anomaly threshold (95th percentile of reconstruction error)
-                    THRESHOLD = np.percentile(reconstruction_error, 95)
-                    anomalies = reconstruction_error > THRESHOLD
+                    if not len(reconstruction_error):
+                        st.warning(f"Need more than {SEQ_LEN} rows to detect anomalies.")
+                    else:
+                        # Set anomaly threshold (95th percentile of reconstruction error)
+                        THRESHOLD = np.percentile(reconstruction_error, 95)
+                        anomalies = reconstruction_error > THRESHOLD
 
-                    # Display anomaly statistics in Streamlit
-                    st.write(f"Total Test Samples: {len(X_test)}")
-                    st.write(f"Anomalies Detected: {np.sum(anomalies)}")
+                        # Display anomaly statistics in Streamlit
+                        st.write(f"Total Test Samples: {len(X_test)}")
+                        st.write(f"Anomalies Detected: {np.sum(anomalies)}")
                     
-                    # Plot anomaly scores as a histogram
-                    fig, ax = plt.subplots(figsize=(10, 5))
-                    ax.hist(reconstruction_error, bins=50)
-                    ax.axvline(THRESHOLD, color='red', linestyle='dashed', label='Anomaly Threshold')
-                    ax.set_xlabel("Reconstruction Error")
-                    ax.set_ylabel("Frequency")
-                    ax.legend()
-                    st.pyplot(fig)
-
-                    # Find the time indices of detected anomalies
-                    anomaly_indices = np.where(anomalies)[0]
-
-                    # Feature Analysis of Anomalies
-                    st.subheader("Feature Analysis of Anomalies")
+                        # Plot anomaly scores as a histogram
+                        fig, ax = plt.subplots(figsize=(10, 5))
+                        ax.hist(reconstruction_error, bins=50)
+                        ax.axvline(THRESHOLD, color='red', linestyle='dashed', label='Anomaly Threshold')
+                        ax.set_xlabel("Reconstruction Error")
+                        ax.set_ylabel("Frequency")
+                        ax.legend()
+                        st.pyplot(fig)
+
+                        # Find the time indices of detected anomalies
+                        anomaly_indices = np.where(anomalies)[0]
+
+                        # Feature Analysis of Anomalies
+                        st.subheader("Feature Analysis of Anomalies")
                     
-                    anomaly_details = []
+                        anomaly_details = []
                     
-                    for idx in anomaly_indices:
-                        seq_data = X_test[idx][-1]  # Last timestep in the sequence
+                        for idx in anomaly_indices:
+                            seq_data = X_test[idx][-1]  # Last timestep in the sequence
                         
-                        # Compute z-scores (how far from mean in standard deviations)
-                        z_scores = np.abs((seq_data - feature_means) / feature_stds)
+                            # Compute z-scores (how far from mean in standard deviations)
+                            z_scores = np.abs((seq_data - feature_means) / feature_stds)
 
-                        # Identify the feature with the highest deviation
-                        most_anomalous_feature_idx = np.argmax(z_scores)
-                        most_anomalous_feature = features[most_anomalous_feature_idx]
-                        max_z_score = z_scores[most_anomalous_feature_idx]
+                            # Identify the feature with the highest deviation
+                            most_anomalous_feature_idx = np.argmax(z_scores)
+                            most_anomalous_feature = features[most_anomalous_feature_idx]
+                            max_z_score = z_scores[most_anomalous_feature_idx]
 
-                        anomaly_details.append({
-                            "Index": idx,
-                            "Most Anomalous Feature": most_anomalous_feature,
-                            "Max Z-Score": (max_z_score)
-                        })
+                            anomaly_details.append({
+                                "Index": idx,
+                                "Most Anomalous Feature": most_anomalous_feature,
+                                "Max Z-Score": (max_z_score)
+                            })
 
-                    anomaly_df = pd.DataFrame(anomaly_details)
-                    st.write(anomaly_df)
+                        anomaly_df = pd.DataFrame(anomaly_details)
+                        st.write(anomaly_df)
 
             else:
                 st.warning("Please upload both a dataset (CSV) and an LSTM Autoencoder model (H5) to proceed.")
@@ -546,29 +551,30 @@ elif st.session_state.page == 'dashboard':
             
             # Reshape for LSTM
             SEQ_LEN = 10
-            attack_X = [attack_data_scaled[i : i + SEQ_LEN] for i in range(len(attack_data_scaled) - SEQ_LEN)]
-            attack_X = np.array(attack_X)
+            attack_X = sliding_windows(attack_data_scaled, SEQ_LEN)[:-1]
             
             # Model Prediction
-            attack_pred = st.session_state.lstm_model.predict(attack_X, verbose=0)
-            attack_reconstruction_error = np.mean(np.abs(attack_pred - attack_X), axis=(1, 2))
+            attack_reconstruction_error = window_errors(st.session_state.lstm_model, attack_X)
 
-            # Compute anomaly threshold dynamically
-            THRESHOLD = np.percentile(attack_reconstruction_error, 95)
+            if not len(attack_reconstruction_error):
+                st.warning(f"Generate more than {SEQ_LEN} samples to detect anomalies.")
+            else:
+                # Compute anomaly threshold dynamically
+                THRESHOLD = np.percentile(attack_reconstruction_error, 95)
             
-            # Detect anomalies
-            attack_anomalies = attack_reconstruction_error > THRESHOLD
-            st.write(f"Anomalies Detected: {np.sum(attack_anomalies)} out of {len(attack_anomalies)}")
-
-            # Plot results
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.plot(attack_reconstruction_error, label="Reconstruction Error")
-            ax.axhline(y=THRESHOLD, color='r', linestyle='--', label="Anomaly Threshold")
-            ax.set_title(f"Reconstruction Error for {attack_type.capitalize()} Attack")
-            ax.set_xlabel("Time Steps")
-            ax.set_ylabel("Reconstruction Error")
-            ax.legend()
-            st.pyplot(fig)
+                # Detect anomalies
+                attack_anomalies = attack_reconstruction_error > THRESHOLD
+                st.write(f"Anomalies Detected: {np.sum(attack_anomalies)} out of {len(attack_anomalies)}")
+
+                # Plot results
+                fig, ax = plt.subplots(figsize=(10, 6))
+                ax.plot(attack_reconstruction_error, label="Reconstruction Error")
+                ax.axhline(y=THRESHOLD, color='r', linestyle='--', label="Anomaly Threshold")
+                ax.set_title(f"Reconstruction Error for {attack_type.capitalize()} Attack")
+                ax.set_xlabel("Time Steps")
+                ax.set_ylabel("Reconstruction Error")
+                ax.legend()
+                st.pyplot(fig)
 
             # Show attack data
             st.subheader("Generated Attack Data")
@@ -0,0 +1,261 @@
+"""
+Offline maintenance commands for the CAN Intrusion Detection backend
+
+Run from the backend directory, e.g. `python manage.py build-svm`
+"""
+
+import argparse
+import json
+import os
+import time
+
+from utils.artifacts import ArtifactStore
+
+
+def build_svm(args):
+    """Fit the One-Class SVM and write its artifact"""
+    from models.svm_model import SVMDetector
+
+    start = time.perf_counter()
+    SVMDetector(
+        dataset_path=args.dataset,
+        artifact_dir=args.artifacts,
+        rebuild=args.force,
+        mode="approx" if args.approx else "exact"
+    )
+    print(f"⏱️ Done in {time.perf_counter() - start:.2f}s")
+
+
+def calibrate_lstm(args):
+    """Recompute the LSTM threshold calibration next to its .h5 file"""
+    from models.lstm_model import LSTMDetector
+
+    start = time.perf_counter()
+    LSTMDetector(
+        model_path=args.model,
+        dataset_path=args.dataset,
+        recalibrate=args.force,
+        chunk_size=args.chunk_size
+    )
+    print(f"⏱️ Done in {time.perf_counter() - start:.2f}s")
+
+
+def score(args):
+    """Score a recorded CSV / Parquet log in fixed-size chunks"""
+    from utils.bulk import BulkScorer
+
+    models = set(args.models.split(","))
+    detectors = {}
+    if "svm" in models:
+        from models.svm_model import SVMDetector
+        detectors["svm_detector"] = SVMDetector(artifact_dir=args.artifacts)
+    if "lstm" in models:
+        from models.lstm_model import LSTMDetector
+        detectors["lstm_detector"] = LSTMDetector(backend=args.lstm_backend or args.backend)
+    if "battery" in models:
+        from models.battery_model import BatteryDetector
+        detectors["battery_detector"] = BatteryDetector(backend=args.battery_backend or args.backend)
+
+    start = time.perf_counter()
+    scorer = BulkScorer(**detectors, batch_size=args.batch_size)
+    summary = scorer.run(args.input, args.output, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print(json.dumps(summary, indent=2))
+    print(f"⏱️ {summary['rows']:,} rows in {elapsed:.2f}s ({summary['rows'] / elapsed:,.0f} rows/s)")
+
+
+def serve(args):
+    """Run N uvicorn workers over one shared copy of the model arrays"""
+    import shutil
+    import uvicorn
+    from models.svm_model import SVMDetector
+    from utils.attack_gen import AttackGenerator
+    from utils.shared import SHARED_DIR_ENV, default_shared_dir, export_arrays
+
+    shared_dir = args.shared_dir or default_shared_dir()
+    svm = SVMDetector(artifact_dir=args.artifacts, mode=args.svm_mode)
+    export_arrays(
+        shared_dir,
+        {**svm.to_arrays(), **AttackGenerator().to_arrays()},
+        meta={"svm_key": svm.artifact_key("data/CAN.csv")}
+    )
+    print(f"📦 Exported shared model arrays to {shared_dir}")
+
+    # Workers inherit these; splitting BLAS threads keeps N workers from
+    # oversubscribing the cores they are meant to scale across
+    os.environ[SHARED_DIR_ENV] = shared_dir
+    os.environ["INFERENCE_BACKEND"] = args.backend
+    threads = str(max(1, (os.cpu_count() or 1) // args.workers))
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, threads)
+
+    try:
+        uvicorn.run("app:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+
+def convert_tflite(args):
+    """Convert both autoencoders to TFLite so serving needs no TensorFlow"""
+    from models.backends import TFLiteBackend
+
+    for model_path in ("models/lstm_autoencoder.h5", "models/battery.h5"):
+        start = time.perf_counter()
+        backend = TFLiteBackend(model_path, block_size=args.block_size, reconvert=args.force)
+        print(f"✅ {model_path}: {backend.model_bytes / 1024:.0f} KB in {time.perf_counter() - start:.2f}s")
+
+
+def bench_backends(args):
+    """Parity, latency and memory of each inference backend against Keras"""
+    from utils.benchmarks import compare_backends
+
+    rows = []
+    for kind in args.models.split(","):
+        rows += compare_backends(
+            kind,
+            args.backends.split(","),
+            dataset_path=args.dataset,
+            n_windows=args.windows,
+            repeat=args.repeat
+        )
+    print(json.dumps(rows, indent=2))
+
+
+def check_backends(args):
+    """Fail if any backend's reconstruction drifts from Keras beyond the tolerance"""
+    from utils.benchmarks import check_backends as check
+
+    for kind in args.models.split(","):
+        try:
+            diffs = check(kind, args.backends.split(","), dataset_path=args.dataset, n_windows=args.windows)
+        except AssertionError as e:
+            raise SystemExit(f"❌ {e}")
+        print(f"✅ {kind}: " + ", ".join(f"{name} max |diff| {diff:.2e}" for name, diff in diffs.items()))
+
+
+def bench_svm(args):
+    """Agreement and throughput of approximate SVMs against the exact model"""
+    from utils.benchmarks import compare_svm_modes
+
+    rows = compare_svm_modes(
+        [int(n) for n in args.components.split(",")],
+        dataset_path=args.dataset,
+        artifact_dir=args.artifacts,
+        repeat=args.repeat
+    )
+    print(json.dumps(rows, indent=2))
+
+
+def bench_fleet(args):
+    """Sustained throughput and latency of the fleet processor against stream count"""
+    from utils.benchmarks import fleet_throughput
+
+    rows = fleet_throughput(
+        [int(n) for n in args.streams.split(",")],
+        rate_hz=args.rate,
+        duration_s=args.duration,
+        tick_ms=args.tick_ms,
+        policy=args.policy,
+        window_stride=args.window_stride,
+        backend=args.backend,
+        svm_mode=args.svm_mode,
+        dataset_path=args.dataset,
+        artifact_dir=args.artifacts
+    )
+    print(json.dumps(rows, indent=2))
+
+
+def show_artifacts(args):
+    """Print manifests of every stored artifact"""
+    manifests = ArtifactStore(args.artifacts).list()
+    if not manifests:
+        print(f"No artifacts in {args.artifacts}")
+    for manifest in manifests:
+        print(json.dumps(manifest, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CAN Intrusion Detection maintenance")
+    parser.add_argument("--artifacts", default="models/artifacts", help="Artifact directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build-svm", help="Train and save the One-Class SVM artifact")
+    p.add_argument("--dataset", default="data/CAN.csv")
+    p.add_argument("--force", action="store_true", help="Retrain even if the artifact is current")
+    p.add_argument("--approx", action="store_true", help="Also distil the approximate SVM")
+    p.set_defaults(func=build_svm)
+
+    p = sub.add_parser("calibrate-lstm", help="Stream the dataset to calibrate the LSTM threshold")
+    p.add_argument("--dataset", default="data/CAN.csv")
+    p.add_argument("--model", default="models/lstm_autoencoder.h5")
+    p.add_argument("--chunk-size", type=int, default=8192, help="Rows per streamed chunk")
+    p.add_argument("--force", action="store_true", help="Recalibrate even if the cache is current")
+    p.set_defaults(func=calibrate_lstm)
+
+    p = sub.add_parser("score", help="Score a recorded CSV or Parquet log offline")
+    p.add_argument("input", help="Input .csv or .parquet log")
+    p.add_argument("output", help="Output .csv or .parquet file for per-row scores")
+    p.add_argument("--models", default="svm,lstm,battery", help="Comma-separated detectors to run")
+    p.add_argument("--chunk-size", type=int, default=50_000, help="Rows read per chunk")
+    p.add_argument("--batch-size", type=int, default=2048, help="Windows per forward pass")
+    p.add_argument("--backend", default="keras", help="LSTM / battery inference backend")
+    p.add_argument("--lstm-backend", default=None, help="Override --backend for the LSTM")
+    p.add_argument("--battery-backend", default=None, help="Override --backend for the battery model")
+    p.set_defaults(func=score)
+
+    p = sub.add_parser("serve", help="Serve the API with multiple worker processes")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--shared-dir", default=None, help="Where to export shared arrays (default: /dev/shm)")
+    p.add_argument("--backend", default=os.getenv("INFERENCE_BACKEND", "keras"), help="LSTM / battery inference backend")
+    p.add_argument("--svm-mode", default=os.getenv("SVM_MODE", "exact"), choices=["exact", "approx"])
+    p.set_defaults(func=serve)
+
+    p = sub.add_parser("convert-tflite", help="Convert the LSTM autoencoders to TFLite")
+    p.add_argument("--block-size", type=int, default=64, help="Windows per batched TFLite call")
+    p.add_argument("--force", action="store_true", help="Reconvert even if the cache is current")
+    p.set_defaults(func=convert_tflite)
+
+    p = sub.add_parser("bench-backends", help="Compare inference backends against Keras")
+    p.add_argument("--models", default="lstm,battery", help="Comma-separated detectors")
+    p.add_argument("--backends", default="keras,tflite,numpy", help="Comma-separated backends")
+    p.add_argument("--dataset", default="data/CAN.csv")
+    p.add_argument("--windows", type=int, default=2000, help="Real windows checked for parity")
+    p.add_argument("--repeat", type=int, default=500, help="Single-window calls timed")
+    p.set_defaults(func=bench_backends)
+
+    p = sub.add_parser("check-backends", help="Check TFLite / NumPy outputs against Keras")
+    p.add_argument("--models", default="lstm,battery", help="Comma-separated detectors")
+    p.add_argument("--backends", default="tflite,numpy", help="Comma-separated backends")
+    p.add_argument("--dataset", default="data/CAN.csv")
+    p.add_argument("--windows", type=int, default=2000, help="Real windows compared")
+    p.set_defaults(func=check_backends)
+
+    p = sub.add_parser("bench-svm", help="Compare approximate SVMs with the exact model")
+    p.add_argument("--components", default="64,128,256,512", help="Comma-separated approximation sizes")
+    p.add_argument("--dataset", default="data/CAN.csv")
+    p.add_argument("--repeat", type=int, default=2000, help="Single-reading calls timed")
+    p.set_defaults(func=bench_svm)
+
+    p = sub.add_parser("bench-fleet", help="Benchmark the fleet stream processor")
+    p.add_argument("--streams", default="100,1000,5000", help="Comma-separated stream counts")
+    p.add_argument("--rate", type=float, default=10.0, help="Frames per second per stream")
+    p.add_argument("--duration", type=float, default=10.0, help="Seconds per stream count")
+    p.add_argument("--tick-ms", type=float, default=100.0)
+    p.add_argument("--policy", default="drop_oldest", choices=["drop_oldest", "drop_newest", "block"])
+    p.add_argument("--window-stride", type=int, default=1, help="Score LSTM / battery windows every k-th frame")
+    p.add_argument("--backend", default="numpy", choices=["keras", "tflite", "numpy"])
+    p.add_argument("--svm-mode", default="exact", choices=["exact", "approx"])
+    p.add_argument("--dataset", default="data/CAN.csv")
+    p.set_defaults(func=bench_fleet)
+
+    p = sub.add_parser("show-artifacts", help="List stored artifacts")
+    p.set_defaults(func=show_artifacts)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
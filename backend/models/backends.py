@@ -0,0 +1,293 @@
+"""
+Pluggable inference backends for the LSTM autoencoders
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils.artifacts import ArtifactStore, fingerprint_file
+
+# Largest reconstruction difference from Keras any backend may show; on
+# CAN.csv windows TFLite and NumPy stay within about 6e-6
+PARITY_ATOL = 1e-5
+
+
+def _load_keras(model_path: str):
+    """Keras model from an .h5 file (imports TensorFlow)"""
+    from tensorflow.keras.models import load_model
+    from tensorflow.keras.losses import mse
+    return load_model(model_path, custom_objects={'mse': mse})
+
+
+class KerasBackend:
+    """Run the original Keras model"""
+
+    name = "keras"
+
+    def __init__(self, model_path: str):
+        self.model = _load_keras(model_path)
+        self.model_bytes = os.path.getsize(model_path)
+
+    def predict(self, windows: np.ndarray) -> np.ndarray:
+        """Reconstruction of a (batch, seq_len, n_features) array"""
+        return self.model.predict_on_batch(windows)
+
+
+def _interpreter_class():
+    """The lightest TFLite interpreter installed; full TensorFlow last"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteBackend:
+    """
+    Run a TFLite conversion of the Keras model
+
+    The converter only lowers these LSTMs to builtin ops when every shape
+    is static, so two graphs are converted: one for a single window (the
+    real-time path) and one for fixed blocks of `block_size` windows, with
+    the last block zero-padded. Neither needs TensorFlow at runtime when
+    `tflite_runtime` or `ai_edge_litert` is installed; TensorFlow is only
+    imported to convert, and conversions are cached next to the .h5.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path: str, block_size: int = 64, reconvert: bool = False):
+        self.block_size = block_size
+        store = ArtifactStore(os.path.dirname(model_path) or ".")
+        name = f"{Path(model_path).stem}.tflite"
+        key = {"model_sha256": fingerprint_file(model_path), "block_size": block_size}
+        graphs = None if reconvert else store.load(name, key)
+
+        if graphs is None:
+            print(f"⏳ Converting {model_path} to TFLite...")
+            graphs = self.convert(model_path, block_size)
+            try:
+                store.save(name, graphs, key)
+            except OSError as e:
+                print(f"⚠️ Could not save TFLite conversion: {e}")
+
+        Interpreter = _interpreter_class()
+        self._single = self._open(Interpreter, graphs["single"])
+        self._block = self._open(Interpreter, graphs["block"])
+        self.model_bytes = len(graphs["single"]) + len(graphs["block"])
+        # Interpreters hold their tensors in place and are not reentrant
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def convert(model_path: str, block_size: int) -> dict[str, bytes]:
+        """Flatbuffers for batch sizes 1 and block_size"""
+        import tensorflow as tf
+
+        model = _load_keras(model_path)
+        _, seq_len, n_features = model.input_shape
+        graphs = {}
+        for key, batch in (("single", 1), ("block", block_size)):
+            forward = tf.function(lambda x: model(x, training=False))
+            concrete = forward.get_concrete_function(tf.TensorSpec([batch, seq_len, n_features], tf.float32))
+            graphs[key] = tf.lite.TFLiteConverter.from_concrete_functions([concrete]).convert()
+        return graphs
+
+    @staticmethod
+    def _open(Interpreter, graph: bytes):
+        interpreter = Interpreter(model_content=graph)
+        interpreter.allocate_tensors()
+        return (
+            interpreter,
+            interpreter.get_input_details()[0]["index"],
+            interpreter.get_output_details()[0]["index"]
+        )
+
+    @staticmethod
+    def _invoke(graph, x: np.ndarray) -> np.ndarray:
+        interpreter, input_index, output_index = graph
+        interpreter.set_tensor(input_index, x)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)
+
+    def predict(self, windows: np.ndarray) -> np.ndarray:
+        """Reconstruction of a (batch, seq_len, n_features) array"""
+        windows = np.ascontiguousarray(windows, dtype=np.float32)
+        n = len(windows)
+        out = np.empty_like(windows)
+
+        with self._lock:
+            full = n - n % self.block_size
+            for start in range(0, full, self.block_size):
+                out[start:start + self.block_size] = self._invoke(self._block, windows[start:start + self.block_size])
+
+            rest = windows[full:]
+            if len(rest) * 8 <= self.block_size:
+                # A few single-window calls beat one mostly-empty block
+                for i in range(len(rest)):
+                    out[full + i] = self._invoke(self._single, rest[i:i + 1])[0]
+            else:
+                padded = np.zeros((self.block_size, *windows.shape[1:]), dtype=np.float32)
+                padded[:len(rest)] = rest
+                out[full:] = self._invoke(self._block, padded)[:len(rest)]
+
+        return out
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    # tanh form cannot overflow in exp for large negative inputs
+    return 0.5 * np.tanh(0.5 * x) + 0.5
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": _sigmoid,
+    "tanh": np.tanh
+}
+
+
+def _activation(name: str):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation '{name}'")
+    return ACTIVATIONS[name]
+
+
+class NumPyBackend:
+    """
+    Run the autoencoder forward pass in NumPy
+
+    Layer configs and weights are read straight from the .h5 file with
+    h5py, so neither loading nor inference imports TensorFlow. Supports
+    the layers these models use: LSTM, Dropout (a no-op at inference),
+    RepeatVector and Dense, optionally wrapped in TimeDistributed.
+    """
+
+    name = "numpy"
+
+    def __init__(self, model_path: str):
+        import h5py
+
+        self.layers = []
+        with h5py.File(model_path, "r") as f:
+            config = json.loads(f.attrs["model_config"])
+            saved = f["model_weights"]
+            for layer in config["config"]["layers"]:
+                name = layer["config"]["name"]
+                group = saved[name] if name in saved else None
+                weights = [np.asarray(group[w]) for w in group.attrs["weight_names"]] if group is not None else []
+                op = self._build(layer, weights)
+                if op is not None:
+                    self.layers.append(op)
+
+        self.model_bytes = sum(p.nbytes for _, *params in self.layers for p in params if isinstance(p, np.ndarray))
+
+    @staticmethod
+    def _build(layer: dict, weights: list[np.ndarray]):
+        """Normalize one Keras layer config into an (op, *params) tuple"""
+        kind, config = layer["class_name"], layer["config"]
+        if kind in ("InputLayer", "Dropout"):
+            return None
+        if kind == "RepeatVector":
+            return ("repeat", config["n"])
+        if kind == "TimeDistributed":
+            kind, config = config["layer"]["class_name"], config["layer"]["config"]
+        if kind == "Dense":
+            kernel, bias = weights if config["use_bias"] else (weights[0], 0)
+            return ("dense", kernel, bias, _activation(config["activation"]))
+        if kind == "LSTM":
+            if config.get("go_backwards") or config.get("stateful"):
+                raise ValueError(f"{config['name']}: go_backwards / stateful LSTMs are not supported")
+            kernel, recurrent, bias = weights if config["use_bias"] else (*weights, 0)
+            # Keras orders gates i, f, c, o; move the candidate last so the
+            # three sigmoid gates are one contiguous slice
+            units = config["units"]
+            order = np.r_[0:2 * units, 3 * units:4 * units, 2 * units:3 * units]
+            bias = bias[order] if isinstance(bias, np.ndarray) else bias
+            return (
+                "lstm", kernel[:, order], recurrent[:, order], bias, units,
+                _activation(config["activation"]), _activation(config["recurrent_activation"]),
+                config["return_sequences"]
+            )
+        raise ValueError(f"Unsupported layer type '{kind}'")
+
+    @staticmethod
+    def _lstm(x, kernel, recurrent, bias, units, activation, recurrent_activation, return_sequences):
+        batch, steps, _ = x.shape
+        # Input projections for every step in one matmul; only h @ U is sequential
+        projected = x @ kernel + bias
+        h = np.zeros((batch, units), dtype=x.dtype)
+        c = np.zeros((batch, units), dtype=x.dtype)
+        outputs = np.empty((batch, steps, units), dtype=x.dtype) if return_sequences else None
+
+        for t in range(steps):
+            z = projected[:, t] + h @ recurrent
+            gates = recurrent_activation(z[:, :3 * units])
+            i, f, o = gates[:, :units], gates[:, units:2 * units], gates[:, 2 * units:]
+            c = f * c + i * activation(z[:, 3 * units:])
+            h = o * activation(c)
+            if return_sequences:
+                outputs[:, t] = h
+
+        return outputs if return_sequences else h
+
+    def predict(self, windows: np.ndarray) -> np.ndarray:
+        """Reconstruction of a (batch, seq_len, n_features) array"""
+        x = np.asarray(windows, dtype=np.float32)
+        for op, *params in self.layers:
+            if op == "lstm":
+                x = self._lstm(x, *params)
+            elif op == "repeat":
+                x = np.broadcast_to(x[:, np.newaxis, :], (x.shape[0], params[0], x.shape[1]))
+            else:
+                kernel, bias, activation = params
+                x = activation(x @ kernel + bias)
+        return x
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "numpy": NumPyBackend
+}
+
+
+def load_backend(name: str, model_path: str):
+    """Instantiate the backend called `name` for an .h5 autoencoder"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](model_path)
+
+
+def check_parity(
+    model_path: str,
+    windows: np.ndarray,
+    backends: tuple[str, ...] = ("tflite", "numpy"),
+    reference: str = "keras",
+    atol: float = PARITY_ATOL
+) -> dict[str, float]:
+    """
+    Largest absolute reconstruction difference of each backend from `reference`
+
+    Raises AssertionError if any backend differs by more than `atol` on
+    `windows` (scaled, (n, seq_len, n_features)).
+    """
+    expected = np.asarray(load_backend(reference, model_path).predict(windows), dtype=np.float64)
+    diffs = {}
+    for name in backends:
+        reconstruction = np.asarray(load_backend(name, model_path).predict(windows), dtype=np.float64)
+        diffs[name] = float(np.max(np.abs(reconstruction - expected)))
+    failed = {name: diff for name, diff in diffs.items() if not diff <= atol}
+    if failed:
+        raise AssertionError(
+            f"{model_path}: " + ", ".join(f"{name} differs from {reference} by {diff:.2e}" for name, diff in failed.items())
+            + f" (tolerance {atol:.0e})"
+        )
+    return diffs
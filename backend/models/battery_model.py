@@ -4,24 +4,44 @@ Battery voltage spoofing detector
 
 import numpy as np
 import pickle
-from tensorflow.keras.models import load_model
-from tensorflow.keras.losses import mse
+
+from models.backends import load_backend
 
 
 class BatteryDetector:
     """Detect voltage spoofing attacks on EV battery"""
     
-    def __init__(self, model_path: str = "models/battery.h5", scaler_path: str = "models/scaler.pkl"):
+    def __init__(
+        self,
+        model_path: str = "models/battery.h5",
+        scaler_path: str = "models/scaler.pkl",
+        backend: str = "keras"
+    ):
         """Load battery LSTM model and scaler"""
         
         self.seq_len = 10
-        self.model = load_model(model_path, custom_objects={'mse': mse})
+        self.backend = load_backend(backend, model_path)
         
         with open(scaler_path, "rb") as f:
             self.scaler = pickle.load(f)
         
         self.threshold = 0.05
-        print("✅ Battery detector loaded")
+        print(f"✅ Battery detector loaded ({self.backend.name})")
+    
+    def prepare(self, voltage_sequence: list[tuple[float, float]]) -> np.ndarray:
+        """Scale the last seq_len (timestamp, voltage) pairs into one window"""
+        data = np.asarray(voltage_sequence[-self.seq_len:], dtype=np.float64)
+        return self.scaler.transform(data)
+    
+    def score_windows(self, windows: np.ndarray) -> np.ndarray:
+        """Mean absolute reconstruction error for each scaled window"""
+        reconstruction = self.backend.predict(windows)
+        return np.mean(np.abs(reconstruction - windows), axis=(1, 2))
+    
+    def warmup(self):
+        """Trace the forward pass on two batch sizes so first requests are not slow"""
+        for batch_size in (1, 2):
+            self.score_windows(np.zeros((batch_size, self.seq_len, 2)))
     
     def detect(self, voltage_sequence: list[tuple[float, float]]) -> tuple[bool, float]:
         """
@@ -33,13 +53,7 @@ class BatteryDetector:
         Returns:
             (is_spoofed, anomaly_score)
         """
-        voltage_sequence = voltage_sequence[-self.seq_len:]
-        data = np.array([[ts, v] for ts, v in voltage_sequence])
-        data_scaled = self.scaler.transform(data)
-        data_scaled = np.array([data_scaled])
-        
-        reconstruction = self.model.predict(data_scaled, verbose=0)
-        error = np.mean(np.abs(reconstruction - data_scaled))
+        error = self.score_windows(self.prepare(voltage_sequence)[np.newaxis])[0]
         is_spoofed = error > self.threshold
         
         return is_spoofed, error
\ No newline at end of file
@@ -2,52 +2,124 @@
 LSTM Autoencoder for anomaly detection
 """
 
+import os
+from pathlib import Path
+
 import numpy as np
-from tensorflow.keras.models import load_model
-from tensorflow.keras.losses import mse
+import sklearn
 from sklearn.preprocessing import StandardScaler
 import pandas as pd
 
+from models.backends import load_backend
+from schemas.features import LSTM_FEATURES
+from utils.artifacts import ArtifactStore, fingerprint_file
+from utils.windows import sliding_windows, window_batches
+
 
 class LSTMDetector:
     """Deep learning anomaly detection using LSTM Autoencoder"""
     
-    def __init__(self, model_path: str = "models/lstm_autoencoder.h5", dataset_path: str = "data/CAN.csv"):
-        """Load pre-trained LSTM model and scaler"""
+    def __init__(
+        self,
+        model_path: str = "models/lstm_autoencoder.h5",
+        dataset_path: str = "data/CAN.csv",
+        recalibrate: bool = False,
+        chunk_size: int = 8192,
+        backend: str = "keras"
+    ):
+        """Load pre-trained LSTM model and its cached threshold calibration"""
         
-        self.features = [
-            "datetime", "Accelerometer1RMS", "Accelerometer2RMS", 
-            "Current", "Pressure", "Temperature", "Thermocouple", 
-            "Volume Flow RateRMS"
-        ]
+        self.features = LSTM_FEATURES
         self.seq_len = 10
+        self.percentile = 95
+        
+        # Load model through the chosen runtime (see models/backends.py)
+        self.backend = load_backend(backend, model_path)
         
-        # Load model
-        self.model = load_model(model_path, custom_objects={'mse': mse})
+        # Calibration lives next to the .h5 (not in git: built on first load
+        # or by `manage.py calibrate-lstm`)
+        store = ArtifactStore(os.path.dirname(model_path) or ".")
+        name = f"{Path(model_path).stem}.calibration"
+        key = {
+            "dataset_sha256": fingerprint_file(dataset_path),
+            "model_sha256": fingerprint_file(model_path),
+            "features": self.features,
+            "seq_len": self.seq_len,
+            "percentile": self.percentile,
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__
+        }
+        calibration = None if recalibrate else store.load(name, key)
         
-        # Fit scaler on training data
-        df = pd.read_csv(dataset_path)
-        df["datetime"] = pd.to_datetime(df["datetime"]).astype(int) / 10**9
-        data = df[self.features].values
+        if calibration is None:
+            print(f"⏳ Calibrating LSTM threshold from {dataset_path}...")
+            calibration = self.calibrate(dataset_path, chunk_size)
+            try:
+                store.save(name, calibration, key)
+            except OSError as e:
+                print(f"⚠️ Could not save LSTM calibration: {e}")
         
         self.scaler = StandardScaler()
-        self.scaler.fit(data)
+        self.scaler.mean_ = calibration["scaler_mean"]
+        self.scaler.scale_ = calibration["scaler_scale"]
+        self.scaler.var_ = calibration["scaler_scale"] ** 2
+        self.scaler.n_features_in_ = len(self.features)
+        self.reconstruction_errors = calibration["reconstruction_errors"]
+        self.threshold = calibration["threshold"]
+        
+        print(f"✅ LSTM Autoencoder loaded ({self.backend.name}, threshold: {self.threshold:.4f})")
+    
+    def _read_chunks(self, dataset_path: str, chunk_size: int):
+        """Stream feature matrices from the dataset without loading it whole"""
+        for df in pd.read_csv(dataset_path, usecols=self.features, chunksize=chunk_size):
+            df["datetime"] = pd.to_datetime(df["datetime"]).astype(int) / 10**9
+            yield df[self.features].values
+    
+    def calibrate(self, dataset_path: str, chunk_size: int = 8192, batch_size: int = 1024) -> dict:
+        """
+        Fit the scaler and reconstruction-error threshold in two streaming passes
+        
+        Windows are strided views over one chunk and only batch_size of them
+        are copied out for each forward pass; the per-window error
+        distribution is the only thing that grows with the dataset.
+        """
+        # Pass 1: scaler statistics
+        scaler = StandardScaler()
+        for data in self._read_chunks(dataset_path, chunk_size):
+            scaler.partial_fit(data)
         
-        # Calculate threshold from training data
-        data_scaled = self.scaler.transform(data)
-        X_train = self._create_sequences(data_scaled)
-        X_train_pred = self.model.predict(X_train, verbose=0)
-        reconstruction_errors = np.mean(np.abs(X_train_pred - X_train), axis=(1, 2))
-        self.threshold = np.percentile(reconstruction_errors, 95)
+        # Pass 2: reconstruction errors. Carrying the last seq_len - 1 rows
+        # into the next chunk yields exactly the windows of a single full pass.
+        errors = []
+        carry = np.empty((0, len(self.features)))
+        for data in self._read_chunks(dataset_path, chunk_size):
+            data_scaled = np.vstack([carry, scaler.transform(data)])
+            windows = sliding_windows(data_scaled, self.seq_len)
+            for _, batch in window_batches(windows, batch_size):
+                errors.append(self.score_windows(batch))
+            carry = data_scaled[-(self.seq_len - 1):]
         
-        print(f"✅ LSTM Autoencoder loaded (threshold: {self.threshold:.4f})")
+        reconstruction_errors = np.concatenate(errors)
+        return {
+            "scaler_mean": scaler.mean_,
+            "scaler_scale": scaler.scale_,
+            "reconstruction_errors": reconstruction_errors.astype(np.float32),
+            "threshold": float(np.percentile(reconstruction_errors, self.percentile))
+        }
     
-    def _create_sequences(self, data: np.ndarray) -> np.ndarray:
-        """Create sliding window sequences"""
-        X = []
-        for i in range(len(data) - self.seq_len):
-            X.append(data[i:i + self.seq_len])
-        return np.array(X)
+    def prepare(self, sequence: list[list[float]]) -> np.ndarray:
+        """Scale the last seq_len readings into one (seq_len, n_features) window"""
+        return self.scaler.transform(np.asarray(sequence[-self.seq_len:], dtype=np.float64))
+    
+    def score_windows(self, windows: np.ndarray) -> np.ndarray:
+        """Reconstruction error for each scaled window in one forward pass"""
+        reconstruction = self.backend.predict(windows)
+        return np.mean(np.abs(reconstruction - windows), axis=(1, 2))
+    
+    def warmup(self):
+        """Trace the forward pass on two batch sizes so first requests are not slow"""
+        for batch_size in (1, 2):
+            self.score_windows(np.zeros((batch_size, self.seq_len, len(self.features))))
     
     def detect(self, sequence: list[list[float]]) -> tuple[bool, float]:
         """
@@ -56,12 +128,7 @@ class LSTMDetector:
         Returns:
             (is_anomaly, reconstruction_error)
         """
-        sequence = sequence[-self.seq_len:]
-        sequence_scaled = self.scaler.transform(sequence)
-        sequence_scaled = np.array([sequence_scaled])
-        
-        reconstruction = self.model.predict(sequence_scaled, verbose=0)
-        error = np.mean(np.abs(reconstruction - sequence_scaled))
+        error = self.score_windows(self.prepare(sequence)[np.newaxis])[0]
         is_anomaly = error > self.threshold
         
         return is_anomaly, error
\ No newline at end of file
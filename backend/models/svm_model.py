@@ -2,52 +2,315 @@
 One-Class SVM anomaly detector with feature importance
 """
 
+import json
+
 import pandas as pd
 import numpy as np
+import sklearn
 from sklearn.svm import OneClassSVM
 from sklearn.preprocessing import StandardScaler
 
+from models.attribution import attribute, rank_features
+from schemas.features import FEATURES
+from utils.artifacts import ArtifactStore, fingerprint_file
+
+# Hyperparameters are part of the artifact key, so changing them here
+# triggers a retrain on the next startup
+SVM_PARAMS = {"kernel": "rbf", "gamma": "auto", "nu": 0.05}
+
+# Approximate mode: an RBF expansion over n_components sampled support
+# vectors, with coefficients distilled from the exact decision function
+APPROX_PARAMS = {"n_components": 256, "ridge": 1e-3, "jitter": 0.5, "seed": 0}
+
+# Decision-function value at or above which a reading is flagged
+ANOMALY_SCORE = 60
+
+
+class ArrayScaler:
+    """StandardScaler.transform over plain (possibly memory-mapped) arrays"""
+    
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean_ = mean
+        self.scale_ = scale
+    
+    def transform(self, X) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class RBFDecision:
+    """
+    Exact One-Class SVM RBF decision function evaluated in NumPy
+    
+    Mirrors the fitted OneClassSVM attributes so it can stand in for the
+    sklearn model when the support vectors live in shared memory.
+    """
+    
+    def __init__(self, support_vectors: np.ndarray, dual_coef: np.ndarray, intercept: np.ndarray, gamma: float):
+        self.support_vectors_ = support_vectors
+        self.dual_coef_ = dual_coef.reshape(1, -1)
+        self.intercept_ = intercept
+        self._gamma = gamma
+        self._sv_norms = np.einsum("ij,ij->i", support_vectors, support_vectors)
+    
+    def kernel(self, X: np.ndarray) -> np.ndarray:
+        """(rows x support vectors) RBF kernel matrix"""
+        sq_dist = (
+            np.einsum("ij,ij->i", X, X)[:, np.newaxis]
+            + self._sv_norms
+            - 2 * X @ self.support_vectors_.T
+        )
+        return np.exp(-self._gamma * np.maximum(sq_dist, 0))
+    
+    def decision_function(self, X: np.ndarray, block_size: int = 4096) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        scores = np.empty(len(X))
+        # Blocks bound the (rows x support vectors) kernel matrix
+        for start in range(0, len(X), block_size):
+            block = X[start:start + block_size]
+            scores[start:start + block_size] = self.kernel(block) @ self.dual_coef_[0] + self.intercept_[0]
+        return scores
+
 
 class SVMDetector:
     """Real-time anomaly detection using One-Class SVM"""
     
-    def __init__(self, dataset_path: str = "data/CAN.csv"):
-        """Initialize and train SVM on normal data"""
-        self.features = [
-            "datetime", "Accelerometer1RMS", "Accelerometer2RMS", 
-            "Current", "Pressure", "Temperature", "Thermocouple", 
-            "Volume Flow RateRMS", "Voltage"
-        ]
-        
-        self.feature_names = [
-            "Timestamp", "Accelerometer 1", "Accelerometer 2",
-            "Current", "Pressure", "Temperature", "Thermocouple",
-            "Volume Flow Rate", "Voltage"
-        ]
+    features = FEATURES
+    
+    feature_names = [
+        "Timestamp", "Accelerometer 1", "Accelerometer 2",
+        "Current", "Pressure", "Temperature", "Thermocouple",
+        "Volume Flow Rate", "Voltage"
+    ]
+    
+    def __init__(
+        self,
+        dataset_path: str = "data/CAN.csv",
+        artifact_dir: str = "models/artifacts",
+        params: dict | None = None,
+        rebuild: bool = False,
+        mode: str = "exact",
+        approx_params: dict | None = None
+    ):
+        """
+        Load the fitted SVM from the artifact store, training it only if stale
         
-        # Load and prepare training data
+        With mode="approx" the exact model is replaced by a distilled
+        approximation over far fewer support vectors (see `_fit_approximation`);
+        `self.approximation` then reports how closely it agrees.
+        """
+        if mode not in ("exact", "approx"):
+            raise ValueError(f"Unknown SVM mode '{mode}' (choose 'exact' or 'approx')")
+        self.params = {**SVM_PARAMS, **(params or {})}
+        self.mode = mode
+        self.approximation = None
+
+        store = ArtifactStore(artifact_dir)
+        key = self.artifact_key(dataset_path)
+        state = None if rebuild else store.load("svm", key)
+
+        if state is None:
+            state = self._fit(dataset_path)
+            try:
+                store.save("svm", state, key)
+            except OSError as e:
+                print(f"⚠️ Could not save SVM artifact: {e}")
+            print("✅ One-Class SVM trained successfully")
+        else:
+            print("✅ One-Class SVM loaded from artifacts")
+
+        self._apply_state(state)
+
+        if mode == "approx":
+            self.approx_params = {**APPROX_PARAMS, **(approx_params or {})}
+            approx_key = {**key, "approx": self.approx_params}
+            approx = None if rebuild else store.load("svm_approx", approx_key)
+            if approx is None:
+                print(f"⏳ Distilling approximate SVM ({self.approx_params['n_components']} components)...")
+                approx = self._fit_approximation(self._scaled_dataset(dataset_path))
+                try:
+                    store.save("svm_approx", approx, approx_key)
+                except OSError as e:
+                    print(f"⚠️ Could not save approximate SVM artifact: {e}")
+            self._apply_approximation(approx)
+            print(f"✅ Approximate SVM ready (agreement {self.approximation['agreement_rate']:.2%})")
+
+    def _apply_state(self, state: dict):
+        self.scaler = state["scaler"]
+        self.model = state["model"]
+        self.feature_means = state["feature_means"]
+        self.feature_stds = state["feature_stds"]
+
+    def _apply_approximation(self, approx: dict):
+        self.mode = "approx"
+        self.model = approx["model"]
+        self.approximation = approx["report"]
+
+    @classmethod
+    def from_state(cls, state: dict, params: dict | None = None) -> "SVMDetector":
+        """Exact detector around a state from `fit_matrix`, without touching disk"""
+        detector = cls.__new__(cls)
+        detector.params = {**SVM_PARAMS, **(params or {})}
+        detector.mode = "exact"
+        detector.approximation = None
+        detector._apply_state(state)
+        return detector
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Fitted state as plain arrays for sharing across worker processes"""
+        return {
+            "svm_scaler_mean": np.asarray(self.scaler.mean_),
+            "svm_scaler_scale": np.asarray(self.scaler.scale_),
+            "svm_support_vectors": np.asarray(self.model.support_vectors_),
+            "svm_dual_coef": np.asarray(self.model.dual_coef_).ravel(),
+            "svm_intercept": np.asarray(self.model.intercept_),
+            "svm_gamma": np.array([self.model._gamma]),
+            "svm_feature_means": np.asarray(self.feature_means),
+            "svm_feature_stds": np.asarray(self.feature_stds),
+            "svm_info": np.array([json.dumps({"mode": self.mode, "approximation": self.approximation})])
+        }
+    
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "SVMDetector":
+        """Build a detector directly on (memory-mapped) arrays from `to_arrays`"""
+        detector = cls.__new__(cls)
+        detector.params = dict(SVM_PARAMS)
+        detector.scaler = ArrayScaler(arrays["svm_scaler_mean"], arrays["svm_scaler_scale"])
+        detector.model = RBFDecision(
+            arrays["svm_support_vectors"],
+            arrays["svm_dual_coef"],
+            arrays["svm_intercept"],
+            float(arrays["svm_gamma"][0])
+        )
+        detector.feature_means = arrays["svm_feature_means"]
+        detector.feature_stds = arrays["svm_feature_stds"]
+        info = json.loads(str(arrays["svm_info"][0]))
+        detector.mode = info["mode"]
+        detector.approximation = info["approximation"]
+        return detector
+    
+    def artifact_key(self, dataset_path: str) -> dict:
+        """Everything the fitted state depends on"""
+        return {
+            "dataset_sha256": fingerprint_file(dataset_path),
+            "features": self.features,
+            "params": self.params,
+            "sklearn": sklearn.__version__
+        }
+
+    def _scaled_dataset(self, dataset_path: str) -> np.ndarray:
+        """Training features scaled with the fitted scaler"""
         df = pd.read_csv(dataset_path)
         df["datetime"] = pd.to_datetime(df["datetime"]).astype(int) / 10**9
+        return self.scaler.transform(df[self.features])
+
+    def _fit_approximation(self, X_scaled: np.ndarray, block_size: int = 8192) -> dict:
+        """
+        Distil the exact decision function onto a sample of its support vectors
         
-        # Train scaler
-        self.scaler = StandardScaler()
-        X_train = df[self.features]
-        X_train_scaled = self.scaler.fit_transform(X_train)
+        Landmarks are n_components support vectors sampled at random
+        (Nystroem-style). Ridge regression fits their coefficients to the
+        exact scores on the training rows plus jittered copies, so the
+        approximation also tracks the exact model just off the normal
+        manifold. Scoring then costs n_components kernel evaluations per
+        reading instead of one per support vector.
+        """
+        p = self.approx_params
+        rng = np.random.default_rng(p["seed"])
+        support_vectors = np.asarray(self.model.support_vectors_)
+        n = min(p["n_components"], len(support_vectors))
+        landmarks = RBFDecision(
+            support_vectors[rng.choice(len(support_vectors), n, replace=False)],
+            np.zeros(n), np.zeros(1), self.model._gamma
+        )
         
-        # Store means and stds for feature importance
-        self.feature_means = np.mean(X_train_scaled, axis=0)
-        self.feature_stds = np.std(X_train_scaled, axis=0)
+        # Accumulate the normal equations block by block so the
+        # (rows x landmarks) feature matrix is never held whole
+        fit_X = np.vstack([X_scaled, X_scaled + rng.normal(0, p["jitter"], X_scaled.shape)])
+        gram, moment = np.zeros((n, n)), np.zeros(n)
+        feature_sum, target_sum = np.zeros(n), 0.0
+        for start in range(0, len(fit_X), block_size):
+            block = fit_X[start:start + block_size]
+            features = landmarks.kernel(block)
+            target = self.model.decision_function(block)
+            gram += features.T @ features
+            moment += features.T @ target
+            feature_sum += features.sum(axis=0)
+            target_sum += target.sum()
         
-        # Train One-Class SVM
-        self.model = OneClassSVM(kernel="rbf", gamma="auto", nu=0.05)
-        self.model.fit(X_train_scaled)
+        # Centered ridge, so the intercept is not penalized
+        rows = len(fit_X)
+        feature_mean, target_mean = feature_sum / rows, target_sum / rows
+        coef = np.linalg.solve(
+            gram - rows * np.outer(feature_mean, feature_mean) + p["ridge"] * np.eye(n),
+            moment - rows * feature_mean * target_mean
+        )
+        model = RBFDecision(
+            landmarks.support_vectors_, coef,
+            np.array([target_mean - feature_mean @ coef]), self.model._gamma
+        )
         
-        print("✅ One-Class SVM trained successfully")
-    
-    def detect(self, sensor_values: list[float]) -> tuple[int, float, dict]:
+        # Agreement on fresh draws near and further from the training data
+        eval_X = np.vstack([
+            X_scaled + rng.normal(0, 0.1, X_scaled.shape),
+            X_scaled + rng.normal(0, p["jitter"], X_scaled.shape)
+        ])
+        exact = self.model.decision_function(eval_X)
+        approx = model.decision_function(eval_X)
+        report = {
+            "n_components": n,
+            "n_support_vectors": len(support_vectors),
+            "eval_rows": len(eval_X),
+            "agreement_rate": float(np.mean((exact >= ANOMALY_SCORE) == (approx >= ANOMALY_SCORE))),
+            "score_mae": float(np.mean(np.abs(exact - approx))),
+            "score_max_abs_error": float(np.max(np.abs(exact - approx)))
+        }
+        return {"model": model, "report": report}
+
+    def _fit(self, dataset_path: str) -> dict:
+        """Train scaler and One-Class SVM on normal data"""
+        df = pd.read_csv(dataset_path)
+        df["datetime"] = pd.to_datetime(df["datetime"]).astype(int) / 10**9
+
+        return self.fit_matrix(df[self.features])
+
+    def fit_matrix(self, X_train, scaler: StandardScaler | None = None) -> dict:
+        """
+        Fit the One-Class SVM on a (n_rows, 9) matrix of normal readings
+        
+        A scaler that is already fitted (e.g. updated incrementally) is
+        used as is; otherwise a new one is fitted to X_train.
+        """
+        # Train scaler
+        if scaler is None:
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+        else:
+            X_train_scaled = scaler.transform(X_train)
+
+        # Train One-Class SVM
+        model = OneClassSVM(**self.params)
+        model.fit(X_train_scaled)
+
+        return {
+            "scaler": scaler,
+            "model": model,
+            # Store means and stds for feature importance
+            "feature_means": np.mean(X_train_scaled, axis=0),
+            "feature_stds": np.std(X_train_scaled, axis=0)
+        }
+
+    def detect(
+        self, sensor_values: list[float], attribution: str = "zscore", top_k: int | None = None, cache=None
+    ) -> tuple[int, float, dict]:
         """
         Detect anomaly in sensor reading with feature importance
         
+        Args:
+            attribution: one of `attribution.METHODS`; model-based methods add
+                a signed "attribution" per feature and rank by its magnitude
+            top_k: keep only the k most important features
+            cache: optional `utils.cache.ScoreCache` of scores by scaled reading
+        
         Returns:
             (prediction, anomaly_score, feature_importance) where:
                 prediction: 1 if anomaly, -1 if normal
@@ -57,24 +320,70 @@ class SVMDetector:
         # Scale input
         sensor_values_scaled = self.scaler.transform([sensor_values])
         
-        # Get anomaly score
-        anomaly_score = self.model.decision_function(sensor_values_scaled)[0]
-        prediction = 1 if anomaly_score >= 60 else -1
+        result = self.score_scaled(sensor_values_scaled, attribution, cache)
+        anomaly_score = result["anomaly_scores"][0]
+        prediction = int(result["predictions"][0])
         
-        # Calculate feature importance (z-scores)
-        z_scores = np.abs((sensor_values_scaled[0] - self.feature_means) / self.feature_stds)
+        # Highest contribution (or |attribution|) first
+        ranking = result.get("attributions", result["contributions"])
+        order = rank_features(ranking, top_k)[0].tolist()
+        feature_importance = [
+            {"feature": self.feature_names[i], "z_score": z_score, "value": value, "contribution": contribution}
+            for i, z_score, value, contribution in zip(
+                order,
+                result["z_scores"][0, order].tolist(),
+                np.asarray(sensor_values, dtype=np.float64)[order].tolist(),
+                result["contributions"][0, order].tolist()
+            )
+        ]
+        if "attributions" in result:
+            for entry, value in zip(feature_importance, result["attributions"][0, order].tolist()):
+                entry["attribution"] = value
         
-        # Create feature importance dict
-        feature_importance = []
-        for i, (name, z_score, value) in enumerate(zip(self.feature_names, z_scores, sensor_values)):
-            feature_importance.append({
-                "feature": name,
-                "z_score": float(z_score),
-                "value": float(value),
-                "contribution": float(z_score / np.sum(z_scores) * 100)  # Percentage
-            })
+        return prediction, anomaly_score, {"features": feature_importance}
+    
+    def detect_batch(self, sensor_matrix: np.ndarray, attribution: str = "zscore", cache=None) -> dict:
+        """
+        Score many sensor readings in one vectorized pass
         
-        # Sort by contribution (highest first)
-        feature_importance.sort(key=lambda x: x["contribution"], reverse=True)
+        Args:
+            sensor_matrix: (n_readings, n_features) array in `self.features` order
+            attribution: one of `attribution.METHODS`
+            cache: optional `utils.cache.ScoreCache`; only uncached rows are scored
         
-        return prediction, anomaly_score, {"features": feature_importance}
\ No newline at end of file
+        Returns:
+            Dict of per-reading arrays: predictions (1 anomaly, -1 normal),
+            anomaly_scores, z_scores and contributions (percent per feature),
+            plus signed attributions for the model-based methods
+        """
+        return self.score_scaled(self.scaler.transform(np.asarray(sensor_matrix, dtype=np.float64)), attribution, cache)
+    
+    def score_scaled(self, X_scaled: np.ndarray, attribution: str = "zscore", cache=None) -> dict:
+        """Same as `detect_batch` for readings that are already scaled"""
+        if cache is not None:
+            return cache.score_rows(self, X_scaled, lambda X: self.score_scaled(X, attribution), attribution)
+        result = attribute(self, X_scaled, attribution)
+        result["predictions"] = np.where(result["anomaly_scores"] >= ANOMALY_SCORE, 1, -1)
+        return result
+    
+    def score_bound(self, X_scaled: np.ndarray) -> np.ndarray:
+        """
+        Upper bound on `decision_function` for each scaled reading, in O(features)
+        
+        No support vector is closer to x than the support vectors' bounding
+        box, so every kernel term is at most exp(-gamma * box_distance^2)
+        and the score at most that times the sum of the positive dual
+        coefficients, plus the intercept (negative coefficients only lower it).
+        """
+        if getattr(self, "_bound_model", None) is not self.model:
+            support_vectors = np.asarray(self.model.support_vectors_)
+            dual_coef = np.asarray(self.model.dual_coef_).ravel()
+            self._bound = (
+                support_vectors.min(axis=0), support_vectors.max(axis=0),
+                float(np.clip(dual_coef, 0, None).sum()), float(np.asarray(self.model.intercept_).ravel()[0]),
+                float(self.model._gamma)
+            )
+            self._bound_model = self.model
+        low, high, weight, intercept, gamma = self._bound
+        gap = np.maximum(np.maximum(low - X_scaled, X_scaled - high), 0)
+        return weight * np.exp(-gamma * np.einsum("ij,ij->i", gap, gap)) + intercept
\ No newline at end of file
@@ -0,0 +1,29 @@
+"""
+Canonical sensor feature order shared by every detector and input format
+"""
+
+# CAN.csv column names, in the column order of every reading matrix
+FEATURES = [
+    "datetime", "Accelerometer1RMS", "Accelerometer2RMS",
+    "Current", "Pressure", "Temperature", "Thermocouple",
+    "Volume Flow RateRMS", "Voltage"
+]
+
+# The same columns as JSON fields (SensorReading aliases) and attributes
+READING_FIELDS = [
+    "datetime", "Accelerometer1RMS", "Accelerometer2RMS",
+    "current", "pressure", "temperature", "thermocouple",
+    "VolumeFlowRateRMS", "voltage"
+]
+READING_ATTRIBUTES = [
+    "datetime", "accelerometer1_rms", "accelerometer2_rms",
+    "current", "pressure", "temperature", "thermocouple",
+    "volume_flow_rate_rms", "voltage"
+]
+
+# Columns of a reading matrix used by each model
+LSTM_COLUMNS = slice(0, 8)
+BATTERY_COLUMNS = [0, 8]
+
+LSTM_FEATURES = FEATURES[LSTM_COLUMNS]
+BATTERY_FEATURES = [FEATURES[i] for i in BATTERY_COLUMNS]
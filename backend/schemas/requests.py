@@ -3,7 +3,12 @@ Pydantic schemas for request/response validation
 """
 
 from pydantic import BaseModel, Field
-from typing import Literal
+from typing import Any, Literal
+
+from schemas.features import READING_ATTRIBUTES
+
+# SVM feature attribution methods (models.attribution.METHODS)
+AttributionMethod = Literal["zscore", "gradient", "occlusion"]
 
 
 class SensorReading(BaseModel):
@@ -22,21 +27,50 @@ class SensorReading(BaseModel):
         populate_by_name = True
     
     def to_array(self) -> list[float]:
-        """Convert to array for ML model input"""
-        return [
-            self.datetime,
-            self.accelerometer1_rms,
-            self.accelerometer2_rms,
-            self.current,
-            self.pressure,
-            self.temperature,
-            self.thermocouple,
-            self.volume_flow_rate_rms,
-            self.voltage
-        ]
+        """Convert to array for ML model input (canonical feature order)"""
+        return [getattr(self, name) for name in READING_ATTRIBUTES]
+
+
+class DetectOptions(BaseModel):
+    """Everything in a DetectRequest except the readings"""
+    models: list[Literal["svm", "lstm", "battery", "timing"]] = Field(
+        ["svm", "lstm", "battery", "timing"], min_length=1, description="Detectors to run"
+    )
+    attribution: AttributionMethod = Field("zscore", description="SVM feature attribution method")
+    top_k: int | None = Field(None, ge=1, description="Return only the k most important SVM features")
+
+
+class DetectRequest(DetectOptions):
+    """Readings to score with several detectors in one call"""
+    readings: list[SensorReading] = Field(..., min_length=1, description="Oldest first; the sequence models use the last 10")
 
 
 class AttackRequest(BaseModel):
     """Request to generate synthetic attack data"""
     attack_type: Literal["fuzzy", "spoofing", "replay", "dos"]
-    num_samples: int = Field(10, ge=1, le=1000)
\ No newline at end of file
+    num_samples: int = Field(10, ge=1, le=100_000)
+    format: Literal["records", "columns"] = Field(
+        "records", description="'columns' returns one list per field instead of one object per sample"
+    )
+
+
+class AttackStreamRequest(BaseModel):
+    """Request to stream synthetic attack traffic"""
+    attack_type: Literal["fuzzy", "spoofing", "replay", "dos"]
+    total: int | None = Field(None, ge=1, description="Frames to send; omit to stream until the client disconnects")
+    rate: float | None = Field(None, gt=0, description="Frames per second; omit to send as fast as the client reads")
+    chunk_size: int = Field(1000, ge=1, le=100_000, description="Most frames generated per batch")
+
+
+class ModelLoadRequest(BaseModel):
+    """Load a new version of a model into the registry"""
+    version: str = Field(..., min_length=1, max_length=64)
+    activate: bool = Field(False, description="Go live as soon as the version is loaded and warmed up")
+    options: dict[str, Any] = Field(
+        default_factory=dict, description="Detector constructor arguments, e.g. model_path or artifact_dir"
+    )
+
+
+class ModelVersionRequest(BaseModel):
+    """Select a loaded model version (to activate or to shadow)"""
+    version: str
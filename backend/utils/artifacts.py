@@ -0,0 +1,101 @@
+"""
+Versioned on-disk store for fitted model artifacts
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+ARTIFACT_FORMAT_VERSION = 1
+
+
+def fingerprint_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """Save and load fitted model state keyed by what it was built from"""
+
+    def __init__(self, root: str = "models/artifacts"):
+        self.root = Path(root)
+
+    def _paths(self, name: str) -> tuple[Path, Path]:
+        return self.root / f"{name}.pkl", self.root / f"{name}.json"
+
+    def _atomic_write(self, path: Path, data: bytes):
+        """Write via a temp file so concurrent workers never see a partial file"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def load(self, name: str, key: dict):
+        """
+        Load an artifact if it was built with exactly this key
+
+        Returns:
+            The saved state, or None if missing, stale or unreadable
+        """
+        payload_path, _ = self._paths(name)
+        if not payload_path.exists():
+            return None
+
+        try:
+            with open(payload_path, "rb") as f:
+                payload = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable artifact {payload_path}: {e}")
+            return None
+
+        if payload.get("key") != {"format": ARTIFACT_FORMAT_VERSION, **key}:
+            return None
+        return payload["state"]
+
+    def save(self, name: str, state, key: dict) -> dict:
+        """Persist state together with the key it was built from"""
+        payload_path, manifest_path = self._paths(name)
+        full_key = {"format": ARTIFACT_FORMAT_VERSION, **key}
+
+        # The key travels inside the payload so a load never pairs a new
+        # pickle with an old manifest; the manifest is for humans and the CLI
+        self._atomic_write(
+            payload_path,
+            pickle.dumps({"key": full_key, "state": state}, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+        manifest = {
+            "name": name,
+            "key": full_key,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "size_bytes": payload_path.stat().st_size
+        }
+        self._atomic_write(manifest_path, json.dumps(manifest, indent=2).encode())
+        return manifest
+
+    def manifest(self, name: str) -> dict | None:
+        """Read the human-readable manifest for an artifact"""
+        _, manifest_path = self._paths(name)
+        if not manifest_path.exists():
+            return None
+        return json.loads(manifest_path.read_text())
+
+    def list(self) -> list[dict]:
+        """Manifests of every artifact in the store"""
+        if not self.root.exists():
+            return []
+        return [json.loads(p.read_text()) for p in sorted(self.root.glob("*.json"))]
@@ -4,18 +4,107 @@ Synthetic attack data generator
 
 import pandas as pd
 import numpy as np
-import random
 from datetime import datetime
 
+# Output sensor keys, in record order, matching the SensorReading aliases
+OUTPUT_COLUMNS = [
+    "Accelerometer1RMS", "Accelerometer2RMS", "Current", "Pressure",
+    "Temperature", "Thermocouple", "Voltage", "VolumeFlowRateRMS"
+]
+
+# Fuzzy attack value ranges per sensor column
+FUZZY_LOW = np.array([0, 0, 0, 10, 20, 10, 200, 5], dtype=np.float64)
+FUZZY_HIGH = np.array([50, 50, 10, 100, 100, 50, 250, 50], dtype=np.float64)
+
+# Spoofing perturbation half-widths per sensor column
+SPOOF_NOISE = np.array([2, 2, 1, 5, 3, 2, 5, 3], dtype=np.float64)
+
+DOS_REPEATS = 5
+
+
+class AttackBatch:
+    """
+    Columnar block of generated samples
+
+    Generation works on whole arrays; rows only become dicts when a caller
+    asks for records at the API boundary.
+    """
+
+    def __init__(self, tags: np.ndarray, timestamps: np.ndarray, sensors: np.ndarray, attack: str):
+        self.tags = tags
+        self.timestamps = timestamps
+        self.sensors = sensors
+        self.attack = attack
+
+    def __len__(self) -> int:
+        return len(self.sensors)
+
+    def head(self, n: int) -> "AttackBatch":
+        """First n samples"""
+        return AttackBatch(self.tags[:n], self.timestamps[:n], self.sensors[:n], self.attack)
+
+    def to_columns(self) -> dict[str, list]:
+        """One list per field"""
+        columns = {
+            "tag": self.tags.tolist(),
+            "datetime": np.datetime_as_string(self.timestamps, unit="us").tolist()
+        }
+        for i, name in enumerate(OUTPUT_COLUMNS):
+            columns[name] = self.sensors[:, i].tolist()
+        columns["Attack"] = [self.attack] * len(self)
+        return columns
+
+    def to_records(self) -> list[dict]:
+        """One dict per sample, in the original record layout"""
+        columns = self.to_columns()
+        keys = list(columns)
+        return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
 
 class AttackGenerator:
     """Generate synthetic CAN bus attack data"""
-    
-    def __init__(self, dataset_path: str = "data/CAN.csv"):
-        """Load normal data for generating attacks"""
-        self.df = pd.read_csv(dataset_path)
-    
-    def generate(self, attack_type: str, num_samples: int = 10) -> list[dict]:
+
+    # Sensor columns of CAN.csv, in the same order as OUTPUT_COLUMNS
+    SENSOR_COLUMNS = [
+        "Accelerometer1RMS", "Accelerometer2RMS", "Current", "Pressure",
+        "Temperature", "Thermocouple", "Voltage", "Volume Flow RateRMS"
+    ]
+
+    def __init__(self, dataset_path: str = "data/CAN.csv", interval_us: int = 50):
+        """
+        Load normal data for generating attacks
+
+        Args:
+            dataset_path: CAN.csv with normal traffic
+            interval_us: Spacing of generated timestamps in microseconds
+        """
+        df = pd.read_csv(dataset_path)
+        self.tags = df["tag"].to_numpy()
+        self.datetimes = df["datetime"].to_numpy(dtype=str)
+        self.sensors = df[self.SENSOR_COLUMNS].to_numpy(dtype=np.float64)
+        self.interval_us = interval_us
+        self.rng = np.random.default_rng()
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Reference dataset as plain arrays for sharing across worker processes"""
+        return {
+            "dataset_tag": self.tags,
+            "dataset_datetime": self.datetimes,
+            "dataset_sensors": self.sensors
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray], interval_us: int = 50) -> "AttackGenerator":
+        """Use (memory-mapped) arrays from `to_arrays` without copying them"""
+        generator = cls.__new__(cls)
+        generator.tags = arrays["dataset_tag"]
+        generator.datetimes = arrays["dataset_datetime"]
+        generator.sensors = arrays["dataset_sensors"]
+        generator.interval_us = interval_us
+        generator.rng = np.random.default_rng()
+        return generator
+
+    def generate(self, attack_type: str, num_samples: int = 10) -> AttackBatch:
         """Generate synthetic attack data"""
         if attack_type == "fuzzy":
             return self._generate_fuzzy(num_samples)
@@ -27,91 +116,69 @@ class AttackGenerator:
             return self._generate_dos(num_samples)
         else:
             raise ValueError(f"Unknown attack type: {attack_type}")
-    
-    def _generate_fuzzy(self, num_samples: int) -> list[dict]:
+
+    def _timestamps(self, n: int) -> np.ndarray:
+        """Current time for the first sample, then evenly spaced"""
+        start = np.datetime64(datetime.now(), "us")
+        return start + np.arange(n) * np.timedelta64(self.interval_us, "us")
+
+    def _sample_indices(self, n: int) -> np.ndarray:
+        """Distinct rows like DataFrame.sample, with replacement only past the dataset size"""
+        return self.rng.choice(len(self.sensors), size=n, replace=n > len(self.sensors))
+
+    def _generate_fuzzy(self, num_samples: int) -> AttackBatch:
         """Fuzzy attack: random sensor values"""
-        attack_data = []
-        for _ in range(num_samples):
-            attack_data.append({
-                "tag": f"Fuzzy_{random.randint(1000, 9999)}",
-                "datetime": datetime.now().isoformat(),
-                "Accelerometer1RMS": random.uniform(0, 50),
-                "Accelerometer2RMS": random.uniform(0, 50),
-                "Current": random.uniform(0, 10),
-                "Pressure": random.uniform(10, 100),
-                "Temperature": random.uniform(20, 100),
-                "Thermocouple": random.uniform(10, 50),
-                "Voltage": random.uniform(200, 250),
-                "VolumeFlowRateRMS": random.uniform(5, 50),
-                "Attack": "Fuzzy"
-            })
-        return attack_data
-    
-    def _generate_spoofing(self, num_samples: int) -> list[dict]:
+        tags = np.char.add("Fuzzy_", self.rng.integers(1000, 10000, num_samples).astype(str))
+        sensors = self.rng.uniform(FUZZY_LOW, FUZZY_HIGH, size=(num_samples, len(OUTPUT_COLUMNS)))
+        return AttackBatch(tags, self._timestamps(num_samples), sensors, "Fuzzy")
+
+    def _generate_spoofing(self, num_samples: int) -> AttackBatch:
         """Spoofing attack: slightly modified normal data"""
-        sampled_rows = self.df.sample(n=num_samples)
-        attack_data = []
-        
-        for _, row in sampled_rows.iterrows():
-            attack_data.append({
-                "tag": row["tag"],
-                "datetime": datetime.now().isoformat(),
-                "Accelerometer1RMS": row["Accelerometer1RMS"] + random.uniform(-2, 2),
-                "Accelerometer2RMS": row["Accelerometer2RMS"] + random.uniform(-2, 2),
-                "Current": row["Current"] + random.uniform(-1, 1),
-                "Pressure": row["Pressure"] + random.uniform(-5, 5),
-                "Temperature": row["Temperature"] + random.uniform(-3, 3),
-                "Thermocouple": row["Thermocouple"] + random.uniform(-2, 2),
-                "Voltage": row["Voltage"] + random.uniform(-5, 5),
-                "VolumeFlowRateRMS": row["Volume Flow RateRMS"] + random.uniform(-3, 3),
-                "Attack": "Spoofing"
-            })
-        return attack_data
-    
-    def _generate_replay(self, num_samples: int) -> list[dict]:
+        idx = self._sample_indices(num_samples)
+        noise = self.rng.uniform(-SPOOF_NOISE, SPOOF_NOISE, size=(num_samples, len(OUTPUT_COLUMNS)))
+        return AttackBatch(self.tags[idx], self._timestamps(num_samples), self.sensors[idx] + noise, "Spoofing")
+
+    def _generate_replay(self, num_samples: int) -> AttackBatch:
         """Replay attack: old data with new timestamp"""
-        sampled_rows = self.df.sample(n=num_samples)
-        attack_data = []
-        
-        for _, row in sampled_rows.iterrows():
-            attack_data.append({
-                "tag": row["tag"],
-                "datetime": datetime.now().isoformat(),
-                "Accelerometer1RMS": row["Accelerometer1RMS"],
-                "Accelerometer2RMS": row["Accelerometer2RMS"],
-                "Current": row["Current"],
-                "Pressure": row["Pressure"],
-                "Temperature": row["Temperature"],
-                "Thermocouple": row["Thermocouple"],
-                "Voltage": row["Voltage"],
-                "VolumeFlowRateRMS": row["Volume Flow RateRMS"],
-                "Attack": "Replay"
-            })
-        return attack_data
-    
-    def _generate_dos(self, num_samples: int) -> list[dict]:
+        idx = self._sample_indices(num_samples)
+        return AttackBatch(self.tags[idx], self._timestamps(num_samples), self.sensors[idx], "Replay")
+
+    def _generate_dos(self, num_samples: int) -> AttackBatch:
         """DoS attack: flood with repeated data"""
-        sampled_rows = self.df.sample(n=num_samples)
-        attack_data = []
-        
-        for _ in range(5):
-            for _, row in sampled_rows.iterrows():
-                attack_data.append({
-                    "tag": row["tag"],
-                    "datetime": datetime.now().isoformat(),
-                    "Accelerometer1RMS": row["Accelerometer1RMS"],
-                    "Accelerometer2RMS": row["Accelerometer2RMS"],
-                    "Current": row["Current"],
-                    "Pressure": row["Pressure"],
-                    "Temperature": row["Temperature"],
-                    "Thermocouple": row["Thermocouple"],
-                    "Voltage": row["Voltage"],
-                    "VolumeFlowRateRMS": row["Volume Flow RateRMS"],
-                    "Attack": "DoS"
-                })
-        return attack_data
-    
+        idx = np.tile(self._sample_indices(num_samples), DOS_REPEATS)
+        return AttackBatch(self.tags[idx], self._timestamps(len(idx)), self.sensors[idx], "DoS")
+
+    def stream(self, attack_type: str, chunk_size: int = 1000, total: int | None = None, interval_us: int | None = None):
+        """
+        Yield attack batches until `total` rows have been produced (or forever)
+
+        Timestamps continue across batches at `interval_us` spacing, so a
+        stream reads as one continuous capture. Each batch is generated only
+        when the consumer asks for it.
+        """
+        interval = np.timedelta64(interval_us or self.interval_us, "us")
+        cursor = np.datetime64(datetime.now(), "us")
+        remaining = total
+
+        while remaining is None or remaining > 0:
+            rows = chunk_size if remaining is None else min(chunk_size, remaining)
+            # DoS emits DOS_REPEATS rows per sampled row
+            samples = max(1, rows // DOS_REPEATS) if attack_type == "dos" else rows
+            batch = self.generate(attack_type, samples)
+            if remaining is not None and len(batch) > remaining:
+                batch = batch.head(remaining)
+
+            batch.timestamps = cursor + np.arange(len(batch)) * interval
+            cursor = batch.timestamps[-1] + interval
+            if remaining is not None:
+                remaining -= len(batch)
+            yield batch
+
     def get_normal_samples(self, n: int = 10) -> list[dict]:
         """Get random normal samples from dataset"""
-        samples = self.df.sample(n=n)
-        return samples.to_dict('records')
\ No newline at end of file
+        idx = self._sample_indices(n)
+        columns = {"tag": self.tags[idx].tolist(), "datetime": self.datetimes[idx].tolist()}
+        for i, name in enumerate(self.SENSOR_COLUMNS):
+            columns[name] = self.sensors[idx, i].tolist()
+        keys = list(columns)
+        return [dict(zip(keys, row)) for row in zip(*columns.values())]
@@ -0,0 +1,159 @@
+"""
+Micro-batching scheduler for model inference
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import numpy as np
+
+
+class _Lane:
+    """Queue and statistics for one model"""
+
+    def __init__(self, name: str, fn: Callable[[np.ndarray], np.ndarray] | None):
+        self.name = name
+        self.fn = fn
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: asyncio.Task | None = None
+
+        self.requests = 0
+        self.batches = 0
+        self.max_batch_size = 0
+        self.total_wait = 0.0
+        self.total_inference = 0.0
+        self.recent_waits = deque(maxlen=1000)
+
+    def metrics(self) -> dict:
+        waits_ms = np.array(self.recent_waits) * 1000
+        return {
+            "queue_depth": self.queue.qsize(),
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "mean_wait_ms": self.total_wait / self.requests * 1000 if self.requests else 0.0,
+            "p95_wait_ms": float(np.percentile(waits_ms, 95)) if len(waits_ms) else 0.0,
+            "mean_inference_ms": self.total_inference / self.batches * 1000 if self.batches else 0.0
+        }
+
+
+class InferenceScheduler:
+    """
+    Coalesce concurrent single-window requests into batched forward passes
+
+    Each registered model gets its own lane. A lane waits for the first
+    request, then keeps collecting for up to `max_wait_ms` or until
+    `max_batch_size` items are queued, runs the model once on the stacked
+    batch in a worker thread and hands every caller its own row.
+    """
+
+    def __init__(self, max_batch_size: int = 64, max_wait_ms: float = 5.0, workers: int = 1):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._lanes: dict[str, _Lane] = {}
+
+    def register(self, name: str, fn: Callable[[np.ndarray], np.ndarray] | None = None):
+        """
+        Add a model lane; `fn` maps a stacked batch to one result per row
+
+        Callers may instead pass their own `fn` with each item, e.g. the
+        score_windows of the model version that prepared the input, so a
+        version switch never mixes one version's preprocessing with
+        another's weights.
+        """
+        self._lanes[name] = _Lane(name, fn)
+
+    def start(self):
+        """Start lane workers on the running event loop"""
+        for lane in self._lanes.values():
+            if lane.task is None:
+                lane.task = asyncio.create_task(self._run(lane))
+
+    async def stop(self):
+        """Cancel lane workers and release the thread pool"""
+        for lane in self._lanes.values():
+            if lane.task is not None:
+                lane.task.cancel()
+                try:
+                    await lane.task
+                except asyncio.CancelledError:
+                    pass
+                lane.task = None
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, name: str, item: np.ndarray, fn: Callable[[np.ndarray], np.ndarray] | None = None):
+        """Queue one input for `name` and wait for its result"""
+        lane = self._lanes[name]
+        future = asyncio.get_running_loop().create_future()
+        await lane.queue.put((item, future, time.perf_counter(), fn or lane.fn))
+        return await future
+
+    def metrics(self) -> dict:
+        """Per-lane queue depth, batch size and wait time statistics"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "models": {name: lane.metrics() for name, lane in self._lanes.items()}
+        }
+
+    async def _collect(self, lane: _Lane) -> list:
+        """Block for one request, then gather more until the window closes"""
+        loop = asyncio.get_running_loop()
+        batch = [await lane.queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not lane.queue.empty():
+                batch.append(lane.queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(lane.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self, lane: _Lane):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect(lane)
+            # Callers that gave up while queued do not need a forward pass
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, enqueued, _ in batch:
+                lane.recent_waits.append(started - enqueued)
+                lane.total_wait += started - enqueued
+
+            # Normally one group; two only while a model version switch is in flight
+            groups = {}
+            for entry in batch:
+                groups.setdefault(entry[3], []).append(entry)
+
+            for fn, group in groups.items():
+                try:
+                    inputs = np.stack([item for item, _, _, _ in group])
+                    results = await loop.run_in_executor(self._executor, fn, inputs)
+                except Exception as e:
+                    for _, future, _, _ in group:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+                for (_, future, _, _), result in zip(group, results):
+                    if not future.done():
+                        future.set_result(result)
+
+            lane.total_inference += time.perf_counter() - started
+            lane.requests += len(batch)
+            lane.batches += 1
+            lane.max_batch_size = max(lane.max_batch_size, len(batch))
@@ -0,0 +1,275 @@
+"""
+Latency, memory and parity measurements for `manage.py bench-*` and
+`check-backends`
+"""
+
+import asyncio
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+
+from models.backends import check_parity
+from schemas.features import BATTERY_FEATURES
+from utils.windows import sliding_windows
+
+
+def _rss_mb() -> float:
+    """Peak resident set size of this process in MB (Linux reports KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+MODEL_PATHS = {"lstm": "models/lstm_autoencoder.h5", "battery": "models/battery.h5"}
+
+
+def _build_detector(kind: str, backend: str):
+    if kind == "lstm":
+        from models.lstm_model import LSTMDetector
+        return LSTMDetector(backend=backend)
+    from models.battery_model import BatteryDetector
+    return BatteryDetector(backend=backend)
+
+
+def _scaled_windows(detector, kind: str, dataset_path: str, n_windows: int) -> np.ndarray:
+    """The first n_windows real windows from the dataset, scaled for `detector`"""
+    columns = BATTERY_FEATURES if kind == "battery" else detector.features
+    df = pd.read_csv(dataset_path, usecols=columns, nrows=n_windows + detector.seq_len - 1)
+    df["datetime"] = pd.to_datetime(df["datetime"]).astype(int) / 10**9
+    scaled = detector.scaler.transform(df[columns].to_numpy(dtype=np.float64))
+    return np.ascontiguousarray(sliding_windows(scaled, detector.seq_len))
+
+
+def _measure_backend(kind: str, backend: str, dataset_path: str, n_windows: int, repeat: int, batch_size: int) -> dict:
+    """Runs in a fresh process so the memory numbers belong to one backend"""
+    # Import pandas / sklearn before the baseline so the delta is the model alone
+    import models.lstm_model
+    import models.battery_model
+
+    baseline = _rss_mb()
+    start = time.perf_counter()
+    detector = _build_detector(kind, backend)
+    detector.warmup()
+    load_s = time.perf_counter() - start
+
+    windows = _scaled_windows(detector, kind, dataset_path, n_windows)
+    reconstruction = np.concatenate([
+        detector.backend.predict(windows[i:i + batch_size]) for i in range(0, len(windows), batch_size)
+    ])
+
+    single = []
+    for i in range(repeat):
+        t = time.perf_counter()
+        detector.score_windows(windows[i % len(windows)][np.newaxis])
+        single.append(time.perf_counter() - t)
+
+    t = time.perf_counter()
+    for i in range(0, len(windows), batch_size):
+        detector.score_windows(windows[i:i + batch_size])
+    batched = (time.perf_counter() - t) / len(windows)
+
+    return {
+        "windows": windows,
+        "reconstruction": np.asarray(reconstruction, dtype=np.float64),
+        "threshold": float(detector.threshold),
+        "load_s": load_s,
+        "rss_mb": _rss_mb() - baseline,
+        "model_bytes": detector.backend.model_bytes,
+        "single_ms_p50": float(np.median(single) * 1000),
+        "single_ms_p99": float(np.percentile(single, 99) * 1000),
+        "batched_us_per_window": batched * 1e6
+    }
+
+
+def _throughput(score, X: np.ndarray, repeat: int, batch_size: int) -> dict:
+    """Single-reading latency and batched rows/s of a scoring function"""
+    single = []
+    for i in range(repeat):
+        t = time.perf_counter()
+        score(X[i % len(X)][np.newaxis])
+        single.append(time.perf_counter() - t)
+
+    t = time.perf_counter()
+    for i in range(0, len(X), batch_size):
+        score(X[i:i + batch_size])
+    elapsed = time.perf_counter() - t
+
+    return {
+        "single_us_p50": round(float(np.median(single)) * 1e6, 1),
+        "single_us_p99": round(float(np.percentile(single, 99)) * 1e6, 1),
+        "batched_rows_per_s": round(len(X) / elapsed)
+    }
+
+
+def compare_svm_modes(
+    components: list[int],
+    dataset_path: str = "data/CAN.csv",
+    artifact_dir: str = "models/artifacts",
+    repeat: int = 2000,
+    batch_size: int = 2048
+) -> list[dict]:
+    """
+    Exact One-Class SVM against approximations of several sizes
+
+    Throughput is measured on the scaled training data; agreement comes
+    from each approximation's own report (held-out jittered readings).
+    """
+    from models.svm_model import SVMDetector
+
+    exact = SVMDetector(dataset_path, artifact_dir)
+    X = exact._scaled_dataset(dataset_path)
+    rows = [{
+        "mode": "exact",
+        "support_vectors": len(exact.model.support_vectors_),
+        **_throughput(exact.model.decision_function, X, repeat, batch_size)
+    }]
+    for n in components:
+        approx = SVMDetector(dataset_path, artifact_dir, mode="approx", approx_params={"n_components": n})
+        report = approx.approximation
+        rows.append({
+            "mode": "approx",
+            "support_vectors": report["n_components"],
+            **_throughput(approx.model.decision_function, X, repeat, batch_size),
+            "agreement_rate": round(report["agreement_rate"], 5),
+            "score_mae": round(report["score_mae"], 4),
+            "score_max_abs_error": round(report["score_max_abs_error"], 3)
+        })
+    return rows
+
+
+def compare_backends(
+    kind: str,
+    backends: list[str],
+    dataset_path: str = "data/CAN.csv",
+    n_windows: int = 2000,
+    repeat: int = 500,
+    batch_size: int = 256,
+    reference: str = "keras"
+) -> list[dict]:
+    """
+    Benchmark each backend of one detector and check it against `reference`
+
+    Every backend runs in its own spawned process; parity is the largest
+    absolute difference from the reference reconstruction and error, plus
+    how many windows change side of the anomaly threshold.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for backend in dict.fromkeys([reference, *backends]):
+        with context.Pool(1) as pool:
+            results[backend] = pool.apply(
+                _measure_backend, (kind, backend, dataset_path, n_windows, repeat, batch_size)
+            )
+
+    ref = results[reference]
+    ref_errors = np.mean(np.abs(ref["reconstruction"] - ref["windows"]), axis=(1, 2))
+    rows = []
+    for backend in backends:
+        r = results[backend]
+        errors = np.mean(np.abs(r["reconstruction"] - r["windows"]), axis=(1, 2))
+        rows.append({
+            "model": kind,
+            "backend": backend,
+            "load_s": round(r["load_s"], 2),
+            "rss_mb": round(r["rss_mb"], 1),
+            "model_kb": round(r["model_bytes"] / 1024, 1),
+            "single_ms_p50": round(r["single_ms_p50"], 3),
+            "single_ms_p99": round(r["single_ms_p99"], 3),
+            "batched_us_per_window": round(r["batched_us_per_window"], 1),
+            "max_abs_diff_reconstruction": float(np.max(np.abs(r["reconstruction"] - ref["reconstruction"]))),
+            "max_abs_diff_error": float(np.max(np.abs(errors - ref_errors))),
+            "flag_mismatches": int(np.sum((errors > r["threshold"]) != (ref_errors > ref["threshold"])))
+        })
+    return rows
+
+
+def check_backends(
+    kind: str,
+    backends: list[str],
+    dataset_path: str = "data/CAN.csv",
+    n_windows: int = 2000,
+    reference: str = "keras"
+) -> dict[str, float]:
+    """`check_parity` of one detector's backends on its first n_windows real windows"""
+    detector = _build_detector(kind, "numpy")
+    windows = _scaled_windows(detector, kind, dataset_path, n_windows)
+    return check_parity(MODEL_PATHS[kind], windows, backends, reference)
+
+
+async def _drive_fleet(processor, X: np.ndarray, streams: int, rate_hz: float, duration_s: float) -> float:
+    """Offer one frame per stream every 1 / rate_hz seconds; returns the time spent"""
+    loop = asyncio.get_running_loop()
+    vehicle_ids = [f"vehicle-{i}" for i in range(streams)]
+    period = 1 / rate_hz
+    start = loop.time()
+    step = 0
+    while loop.time() - start < duration_s:
+        for i, vehicle_id in enumerate(vehicle_ids):
+            processor.offer(vehicle_id, X[(step + 7 * i) % len(X)])
+        step += 1
+        await asyncio.sleep(max(0.0, start + step * period - loop.time()))
+    return loop.time() - start
+
+
+def fleet_throughput(
+    stream_counts: list[int],
+    rate_hz: float = 10.0,
+    duration_s: float = 10.0,
+    tick_ms: float = 100.0,
+    policy: str = "drop_oldest",
+    window_stride: int = 1,
+    backend: str = "numpy",
+    svm_mode: str = "exact",
+    dataset_path: str = "data/CAN.csv",
+    artifact_dir: str = "models/artifacts"
+) -> list[dict]:
+    """
+    Sustained frames/s and end-to-end latency of the fleet processor
+
+    For each stream count, every stream sends `rate_hz` real readings per
+    second for `duration_s` seconds, from the same event loop the
+    processor runs on. Latency runs from `offer` to the end of the tick
+    that scored the frame; shed frames are those dropped by `policy`.
+    """
+    from models.svm_model import SVMDetector
+    from models.lstm_model import LSTMDetector
+    from models.battery_model import BatteryDetector
+    from schemas.features import FEATURES
+    from utils.fleet import FleetProcessor
+
+    svm = SVMDetector(dataset_path, artifact_dir, mode=svm_mode)
+    lstm = LSTMDetector(dataset_path=dataset_path, backend=backend)
+    battery = BatteryDetector(backend=backend)
+    df = pd.read_csv(dataset_path, usecols=FEATURES, nrows=5000)
+    df["datetime"] = pd.to_datetime(df["datetime"]).astype(int) / 10**9
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+
+    async def run(streams: int) -> dict:
+        latencies = []
+        processor = FleetProcessor(
+            lambda: svm, lambda: lstm, lambda: battery,
+            tick_ms=tick_ms, policy=policy, capacity=streams, window_stride=window_stride,
+            on_result=lambda result: latencies.append(result["latency_s"])
+        )
+        processor.start()
+        elapsed = await _drive_fleet(processor, X, streams, rate_hz, duration_s)
+        await asyncio.sleep(2 * tick_ms / 1000)
+        await processor.stop()
+
+        latencies_ms = np.concatenate(latencies) * 1000 if latencies else np.zeros(1)
+        metrics = processor.metrics()
+        offered = processor.processed + metrics["pending"] + metrics["shed"]
+        return {
+            "streams": streams,
+            "offered_fps": round(offered / elapsed),
+            "processed_fps": round(processor.processed / elapsed),
+            "shed": metrics["shed"],
+            "backlog": metrics["pending"],
+            "latency_ms_p50": round(float(np.percentile(latencies_ms, 50)), 1),
+            "latency_ms_p99": round(float(np.percentile(latencies_ms, 99)), 1),
+            "mean_tick_ms": metrics["mean_tick_ms"]
+        }
+
+    return [asyncio.run(run(streams)) for streams in stream_counts]
+
@@ -0,0 +1,142 @@
+"""
+Offline bulk scoring of recorded CAN logs
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from schemas.features import FEATURES, LSTM_COLUMNS, BATTERY_COLUMNS
+from utils.windows import sliding_windows, window_batches
+
+# Generated attack logs use the API spelling of this column
+COLUMN_ALIASES = {"VolumeFlowRateRMS": "Volume Flow RateRMS"}
+
+# Identifying columns copied from the input when present
+PASSTHROUGH = ["tag", "datetime", "Attack"]
+
+
+def read_chunks(path: str, chunk_size: int):
+    """Yield DataFrames of at most chunk_size rows from a CSV or Parquet file"""
+    if Path(path).suffix.lower() == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Reading Parquet requires pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class _OutputWriter:
+    """Append score chunks to a CSV or Parquet file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = Path(path).suffix.lower() == ".parquet"
+        self._writer = None
+        self._started = False
+
+    def write(self, df: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a" if self._started else "w", header=not self._started, index=False)
+        self._started = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class BulkScorer:
+    """
+    Score arbitrarily large logs in constant memory
+
+    The input is read in fixed-size chunks. The last seq_len - 1 scaled rows
+    of each chunk are carried into the next, so every row from the tenth
+    onward gets LSTM and battery scores for the window ending at that row,
+    exactly as if the file had been scored in one piece.
+    """
+
+    def __init__(self, svm_detector=None, lstm_detector=None, battery_detector=None, batch_size: int = 2048):
+        self.svm = svm_detector
+        self.lstm = lstm_detector
+        self.battery = battery_detector
+        self.batch_size = batch_size
+        self._lstm_carry = None
+        self._battery_carry = None
+
+    def _prepare(self, df: pd.DataFrame) -> np.ndarray:
+        """Canonical (n_rows, 9) feature matrix from a raw log chunk"""
+        df = df.rename(columns=COLUMN_ALIASES)
+        if not pd.api.types.is_numeric_dtype(df["datetime"]):
+            df["datetime"] = pd.to_datetime(df["datetime"]).astype(int) / 10**9
+        return df[FEATURES].to_numpy(dtype=np.float64)
+
+    def _score_windows(self, detector, carry: np.ndarray | None, scaled: np.ndarray):
+        """Per-row window scores for one chunk; returns (scores, new carry)"""
+        seq_len = detector.seq_len
+        data = scaled if carry is None else np.vstack([carry, scaled])
+        offset = len(data) - len(scaled)
+        scores = np.full(len(scaled), np.nan)
+
+        # Window i of `data` ends at data row i + seq_len - 1. The carry is
+        # at most seq_len - 1 rows, so every window ends inside this chunk.
+        for start, batch in window_batches(sliding_windows(data, seq_len), self.batch_size):
+            first_row = start + seq_len - 1 - offset
+            scores[first_row:first_row + len(batch)] = detector.score_windows(batch)
+
+        return scores, data[-(seq_len - 1):]
+
+    def score_chunk(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Score one chunk, continuing windows from the previous chunk"""
+        raw = self._prepare(df)
+        out = df[[c for c in PASSTHROUGH if c in df.columns]].reset_index(drop=True)
+
+        if self.svm is not None:
+            result = self.svm.detect_batch(raw)
+            out["svm_score"] = result["anomaly_scores"]
+            out["svm_anomaly"] = result["predictions"] == 1
+
+        if self.lstm is not None:
+            scaled = self.lstm.scaler.transform(raw[:, LSTM_COLUMNS])
+            errors, self._lstm_carry = self._score_windows(self.lstm, self._lstm_carry, scaled)
+            out["lstm_error"] = errors
+            out["lstm_anomaly"] = errors > self.lstm.threshold
+
+        if self.battery is not None:
+            scaled = self.battery.scaler.transform(raw[:, BATTERY_COLUMNS])
+            scores, self._battery_carry = self._score_windows(self.battery, self._battery_carry, scaled)
+            out["battery_score"] = scores
+            out["battery_spoofed"] = scores > self.battery.threshold
+
+        return out
+
+    def run(self, input_path: str, output_path: str, chunk_size: int = 50_000) -> dict:
+        """Stream input_path through the detectors into output_path"""
+        self._lstm_carry = self._battery_carry = None
+        writer = _OutputWriter(output_path)
+        rows = 0
+        flagged = {}
+
+        try:
+            for df in read_chunks(input_path, chunk_size):
+                scored = self.score_chunk(df)
+                writer.write(scored)
+                rows += len(scored)
+                for column in ("svm_anomaly", "lstm_anomaly", "battery_spoofed"):
+                    if column in scored:
+                        flagged[column] = flagged.get(column, 0) + int(scored[column].sum())
+                print(f"  scored {rows:,} rows")
+        finally:
+            writer.close()
+
+        return {"rows": rows, **flagged}
@@ -0,0 +1,215 @@
+"""
+Bounded LRU/TTL cache of model scores for repeated readings and windows
+"""
+
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from itertools import count
+
+import numpy as np
+
+# Seconds of lookups behind `recent_hit_rate`
+RECENT_S = 10.0
+
+# Record field holding plain-array results
+_ARRAY = "__array__"
+
+
+class ScoreCache:
+    """
+    Scores keyed on a quantized hash of the scaled model input
+
+    Inputs (one scaled reading, or one scaled window for the sequence
+    models) are rounded to multiples of `quantum` (in standard deviations),
+    so replayed or flooded readings that differ only in float noise or in a
+    sub-quantum timestamp step share an entry. Keys also carry the detector
+    they were scored with, so a new model version never sees old scores.
+
+    Entries are evicted least-recently-used beyond `max_entries` and expire
+    `ttl_s` seconds after they were stored (None keeps them until evicted).
+    A `max_entries` of 0 disables caching.
+
+    A high `recent_hit_rate` means the traffic is mostly repeats, which on
+    this bus is itself a replay / DoS signal.
+    """
+
+    def __init__(self, name: str, max_entries: int = 100_000, ttl_s: float | None = 300.0, quantum: float = 1e-3):
+        if max_entries < 0:
+            raise ValueError("max_entries must be >= 0")
+        if quantum <= 0:
+            raise ValueError("quantum must be > 0")
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.quantum = quantum
+
+        self._entries = OrderedDict()
+        self._tokens = weakref.WeakKeyDictionary()
+        self._next_token = count()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._recent = deque()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _token(self, detector) -> int:
+        token = self._tokens.get(detector)
+        if token is None:
+            token = self._tokens[detector] = next(self._next_token)
+        return token
+
+    def keys(self, detector, inputs: np.ndarray, *extra) -> list:
+        """One key per row of `inputs` (rows may be readings or whole windows)"""
+        quantized = np.ascontiguousarray(np.rint(np.asarray(inputs).reshape(len(inputs), -1) / self.quantum), dtype=np.int64)
+        rows = quantized.view(np.dtype((np.void, quantized.shape[1] * quantized.itemsize))).ravel().tolist()
+        with self._lock:
+            prefix = (self._token(detector),) + extra
+        return [prefix + (row,) for row in rows]
+
+    def key(self, detector, inputs: np.ndarray, *extra):
+        """Key of a single reading or window"""
+        return self.keys(detector, np.asarray(inputs)[np.newaxis], *extra)[0]
+
+    def _lookup(self, key, now: float):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires is not None and expires <= now:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value, now: float):
+        self._entries[key] = (None if self.ttl_s is None else now + self.ttl_s, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _record(self, hits: int, misses: int, now: float):
+        self.hits += hits
+        self.misses += misses
+        # One [second, hits, misses] bucket per second of traffic
+        second = int(now)
+        if self._recent and self._recent[-1][0] == second:
+            self._recent[-1][1] += hits
+            self._recent[-1][2] += misses
+        else:
+            self._recent.append([second, hits, misses])
+        while self._recent[0][0] <= now - RECENT_S - 1:
+            self._recent.popleft()
+
+    @staticmethod
+    def _pack(results) -> list:
+        """
+        One (dtype, bytes) entry per row of an array or dict of arrays
+
+        Rows are stored as packed records, so a batch is reassembled with
+        one join and one `frombuffer` instead of per-row array copies.
+        """
+        columns = results if isinstance(results, dict) else {_ARRAY: results}
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        dtype = np.dtype([(name, values.dtype, values.shape[1:]) for name, values in columns.items()])
+        records = np.empty(len(next(iter(columns.values()))), dtype=dtype)
+        for name, values in columns.items():
+            records[name] = values
+        return [(dtype, row) for row in records.view(np.dtype((np.void, dtype.itemsize))).tolist()]
+
+    @staticmethod
+    def _unpack(entries: list):
+        records = np.frombuffer(bytearray(b"".join(row for _, row in entries)), dtype=entries[0][0])
+        names = records.dtype.names
+        return records[_ARRAY] if names == (_ARRAY,) else {name: records[name] for name in names}
+
+    def _get(self, keys: list, now: float) -> list:
+        with self._lock:
+            return [self._lookup(key, now) for key in keys]
+
+    def _put(self, keys: list, entries: list, now: float):
+        with self._lock:
+            for key, entry in zip(keys, entries):
+                self._store(key, entry, now)
+
+    def score_rows(self, detector, inputs: np.ndarray, fn, *extra):
+        """
+        `fn(inputs)` computed only for rows not already cached
+
+        `fn` returns an array, or a dict of arrays, aligned with its input
+        rows. Repeats within `inputs` are scored once as well.
+        """
+        if not self.enabled or not len(inputs):
+            return fn(inputs)
+        keys = self.keys(detector, inputs, *extra)
+        now = time.monotonic()
+        cached = self._get(keys, now)
+
+        # First row of each distinct uncached key
+        first = {}
+        for i, (key, entry) in enumerate(zip(keys, cached)):
+            if entry is None and key not in first:
+                first[key] = i
+        with self._lock:
+            self._record(len(keys) - len(first), len(first), now)
+
+        fresh = {}
+        if first:
+            computed = fn(inputs[list(first.values())])
+            fresh = dict(zip(first, self._pack(computed)))
+            self._put(list(fresh), list(fresh.values()), now)
+            if len(first) == len(keys):
+                return computed
+        return self._unpack([entry if entry is not None else fresh[key] for key, entry in zip(keys, cached)])
+
+    async def score_window(self, detector, window: np.ndarray, submit):
+        """`await submit()` for one scaled window, unless its score is cached"""
+        if not self.enabled:
+            return await submit()
+        key = self.key(detector, window)
+        now = time.monotonic()
+        entry = self._get([key], now)[0]
+        with self._lock:
+            self._record(int(entry is not None), int(entry is None), now)
+        if entry is not None:
+            return self._unpack([entry])[0]
+        value = await submit()
+        self._put([key], self._pack(np.asarray([value])), now)
+        return value
+
+    def metrics(self) -> dict:
+        """Size, hit rates (overall and over the last RECENT_S seconds) and evictions"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            now = time.monotonic()
+            recent = [(h, m) for second, h, m in self._recent if second > now - RECENT_S - 1]
+            recent_hits = sum(h for h, _ in recent)
+            recent_lookups = recent_hits + sum(m for _, m in recent)
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "quantum": self.quantum,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "recent_hit_rate": recent_hits / recent_lookups if recent_lookups else 0.0,
+                "recent_lookups": recent_lookups,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,150 @@
+"""
+Tiered detection: cheap per-reading checks in front of the heavy models
+"""
+
+import threading
+
+import numpy as np
+
+from models.svm_model import ANOMALY_SCORE
+
+# On CAN.csv a 1.5 gate skips about a quarter of LSTM windows and keeps
+# 98% of its flags. The battery model flags nearly every training window,
+# so gating it only loses flags.
+Z_GATES = {"lstm": 1.5, "battery": 0.0}
+
+
+class _Tier:
+    """Inputs seen and passed on by one tier"""
+
+    def __init__(self):
+        self.inputs = 0
+        self.passed = 0
+        self.sampled = 0
+        self.sampled_flagged = 0
+
+    def metrics(self, sampling: bool) -> dict:
+        metrics = {
+            "inputs": self.inputs,
+            "passed": self.passed,
+            "skipped": self.inputs - self.passed,
+            "pass_rate": self.passed / self.inputs if self.inputs else None
+        }
+        if sampling:
+            metrics["sampled"] = self.sampled
+            metrics["sampled_flagged"] = self.sampled_flagged
+            metrics["estimated_miss_rate"] = self.sampled_flagged / self.sampled if self.sampled else None
+        return metrics
+
+
+class Cascade:
+    """
+    Decide per reading which of the heavy models have to run
+
+    Tier 1 (per reading, O(features)):
+      - SVM: a reading whose `SVMDetector.score_bound` is below the anomaly
+        score cannot be flagged, so the SVM is not evaluated for it. This
+        is exact: no SVM verdict changes, suspicious or not. Live readings
+        stamped with the current time are far outside the training range,
+        so all of them skip the SVM.
+      - Arrivals: a reading whose sensor values repeat the stream's previous
+        reading (duplicate) or whose timestamp is less than `min_interval_s`
+        after it (burst; with the default 0, a timestamp going backwards)
+        is suspicious and goes to the sequence models.
+
+    Tier 2 (per window, O(window)): an LSTM / battery window is scored only
+    if one of its sensor values lies more than that model's `z_gates` entry
+    in standard deviations from the training mean (windows are standardized
+    by the model's own scaler), its latest reading is suspicious, or it is
+    sampled (`sample_rate`). Sampled windows the gate would have skipped
+    estimate the share of skipped windows the model would have flagged
+    (`estimated_miss_rate`). A gate of 0 passes every window.
+
+    One cascade can be shared by every stream; counters are thread-safe.
+    """
+
+    def __init__(
+        self,
+        z_gates: dict[str, float] | None = None,
+        sample_rate: float = 0.05,
+        min_interval_s: float = 0.0,
+        seed: int | None = None
+    ):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.z_gates = {**Z_GATES, **(z_gates or {})}
+        self.sample_rate = sample_rate
+        self.min_interval_s = min_interval_s
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        self.readings = 0
+        self.duplicates = 0
+        self.bursts = 0
+        self.tiers = {"svm": _Tier(), "lstm": _Tier(), "battery": _Tier()}
+
+    def arrivals(self, rows: np.ndarray, previous: np.ndarray) -> np.ndarray:
+        """
+        Suspicious flag per reading from its stream's previous reading
+
+        `rows` and `previous` are aligned (n, features) raw readings in
+        canonical order; rows of `previous` are NaN where a stream has none.
+        """
+        duplicate = np.all(rows[:, 1:] == previous[:, 1:], axis=1)
+        burst = rows[:, 0] - previous[:, 0] < self.min_interval_s
+        with self._lock:
+            self.readings += len(rows)
+            self.duplicates += int(duplicate.sum())
+            self.bursts += int(burst.sum())
+        return duplicate | burst
+
+    def svm_gate(self, svm, X_scaled: np.ndarray) -> np.ndarray:
+        """Readings the SVM has to score: those it could flag"""
+        passed = svm.score_bound(X_scaled) >= ANOMALY_SCORE
+        with self._lock:
+            self.tiers["svm"].inputs += len(passed)
+            self.tiers["svm"].passed += int(passed.sum())
+        return passed
+
+    def window_gate(self, name: str, windows: np.ndarray, suspicious: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (passed, sampled) masks over standardized windows
+
+        `sampled` marks the passed windows that the gate alone would have
+        skipped; report their errors with `observe`.
+        """
+        # Column 0 is the timestamp: live readings sit far outside the
+        # training range and would pass every window
+        extreme = np.abs(windows[..., 1:]).reshape(len(windows), -1).max(axis=1) > self.z_gates[name]
+        gated = extreme | suspicious
+        with self._lock:
+            sampled = ~gated & (self._rng.random(len(windows)) < self.sample_rate)
+            passed = gated | sampled
+            tier = self.tiers[name]
+            tier.inputs += len(windows)
+            tier.passed += int(passed.sum())
+            tier.sampled += int(sampled.sum())
+        return passed, sampled
+
+    def observe(self, name: str, sampled_errors: np.ndarray, threshold: float):
+        """Errors of the sampled windows, for the miss-rate estimate"""
+        flagged = int((np.asarray(sampled_errors) > threshold).sum())
+        if flagged:
+            with self._lock:
+                self.tiers[name].sampled_flagged += flagged
+
+    def metrics(self) -> dict:
+        """Per-tier pass rates, duplicate / burst counts and the gate's estimated miss rate"""
+        with self._lock:
+            return {
+                "z_gates": self.z_gates,
+                "sample_rate": self.sample_rate,
+                "min_interval_s": self.min_interval_s,
+                "readings": self.readings,
+                "duplicates": self.duplicates,
+                "bursts": self.bursts,
+                "tiers": {
+                    name: tier.metrics(sampling=name != "svm")
+                    for name, tier in self.tiers.items()
+                }
+            }
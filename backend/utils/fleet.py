@@ -0,0 +1,456 @@
+"""
+Multiplexed stream processing for many concurrent vehicle feeds
+"""
+
+import asyncio
+import time
+import traceback
+from collections import deque
+from typing import Callable
+
+import numpy as np
+
+from schemas.features import FEATURES, LSTM_COLUMNS, BATTERY_COLUMNS
+from utils.cascade import Cascade
+from utils.timing import TimingDetector
+
+POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+class _Windows:
+    """
+    Sliding windows of scaled rows for every vehicle in one array
+
+    Same layout as session.RingBuffer, one row per vehicle: each row is
+    written twice, `size` apart, so a window is a fixed offset from the
+    head and many vehicles' windows are gathered with one fancy index.
+    Stored as float32, the precision the models run at.
+    """
+
+    def __init__(self, capacity: int, size: int, width: int, stride: int = 1):
+        self.size = size
+        self.stride = stride
+        self.data = np.zeros((capacity, 2 * size, width), dtype=np.float32)
+        self.head = np.zeros(capacity, dtype=np.int64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.seen = np.zeros(capacity, dtype=np.int64)
+        self._offsets = np.arange(size)
+
+    def grow(self, capacity: int):
+        extra = capacity - len(self.head)
+        self.data = np.concatenate([self.data, np.zeros((extra, *self.data.shape[1:]), dtype=np.float32)])
+        for name in ("head", "count", "seen"):
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(extra, dtype=np.int64)]))
+
+    def reset(self, slots=slice(None)):
+        self.head[slots] = 0
+        self.count[slots] = 0
+        self.seen[slots] = 0
+
+    def append(self, slots: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Append one row per slot (slots unique)
+
+        Returns the slots whose window is due for scoring (full, and on
+        every `stride`-th row) and those windows.
+        """
+        head = self.head[slots]
+        self.data[slots, head] = rows
+        self.data[slots, head + self.size] = rows
+        self.head[slots] = (head + 1) % self.size
+        self.count[slots] = np.minimum(self.count[slots] + 1, self.size)
+        self.seen[slots] += 1
+
+        due = (self.count[slots] == self.size) & ((self.seen[slots] - self.size) % self.stride == 0)
+        full = slots[due]
+        return full, self.data[full[:, np.newaxis], self.head[full, np.newaxis] + self._offsets]
+
+
+class FleetProcessor:
+    """
+    Score thousands of vehicle streams in shared batches on a fixed tick
+
+    Frames are queued per vehicle in preallocated arrays (at most
+    `max_pending` each). Every `tick_ms` the processor takes up to
+    `max_rounds` frames from every vehicle with pending data: all of them
+    are scored by the SVM in one call, and each round appends one row per
+    vehicle to the LSTM / battery windows, with every full window from
+    every round scored in one forward pass per model. Model work runs in
+    a worker thread, so ingestion continues during a tick.
+
+    When a vehicle's queue is full, `policy` decides: "drop_oldest"
+    keeps the freshest data, "drop_newest" rejects the new frame, and
+    "block" makes `put` wait for room (back-pressure on that stream
+    only). Shed frames are counted per vehicle.
+
+    `svm`, `lstm` and `battery` return the current detector (or None) so
+    model swaps are picked up between ticks; a new LSTM / battery version
+    restarts the windows. `on_result` receives each tick's results.
+
+    The sequence models dominate the cost of a tick. With `window_stride`
+    k > 1 they score each vehicle's window on every k-th frame only
+    (windows still advance on every frame), cutting that cost by k while
+    the SVM still scores every frame.
+
+    `caches` optionally maps model names to `utils.cache.ScoreCache`s, so
+    repeated readings and windows (replay / flood traffic) are looked up
+    instead of scored. With a `utils.cascade.Cascade`, readings the SVM
+    cannot flag are not scored by it (their `svm_score` is NaN) and LSTM /
+    battery windows only run when the cascade passes them on (NaN
+    otherwise). A `utils.timing.TimingDetector` flags floods and replays
+    per vehicle; flagged frames count as anomalies and as suspicious
+    readings for the cascade.
+    """
+
+    def __init__(
+        self,
+        svm: Callable[[], object],
+        lstm: Callable[[], object] | None = None,
+        battery: Callable[[], object] | None = None,
+        tick_ms: float = 100.0,
+        max_pending: int = 16,
+        max_rounds: int = 4,
+        policy: str = "drop_oldest",
+        on_result: Callable[[dict], None] | None = None,
+        capacity: int = 1024,
+        seq_len: int = 10,
+        window_stride: int = 1,
+        caches: dict | None = None,
+        cascade: Cascade | None = None,
+        timing: TimingDetector | None = None
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown load-shedding policy '{policy}' (choose from {', '.join(POLICIES)})")
+        self.svm, self.lstm, self.battery = svm, lstm, battery
+        self.tick = tick_ms / 1000
+        self.max_pending = max_pending
+        self.max_rounds = max_rounds
+        self.policy = policy
+        self.on_result = on_result
+        self.caches = caches or {}
+        self.cascade = cascade
+        self.timing = timing
+
+        self.vehicle_ids: list[str | None] = [None] * capacity
+        self._slots: dict[str, int] = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        self._releasing: list[int] = []
+        # Windows belong to the worker thread; new slots are reset before the next tick
+        self._new_slots: list[int] = []
+
+        width = len(FEATURES)
+        self._pending = np.zeros((capacity, max_pending, width))
+        self._enqueued = np.zeros((capacity, max_pending))
+        self._start = np.zeros(capacity, dtype=np.int64)
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self.frames = np.zeros(capacity, dtype=np.int64)
+        self.anomalies = np.zeros(capacity, dtype=np.int64)
+        self.shed = np.zeros(capacity, dtype=np.int64)
+        self.last_score = np.full(capacity, np.nan)
+        # Previous reading per stream for the cascade's arrival checks (worker thread)
+        self._last_rows = np.full((capacity, width), np.nan)
+
+        self._lstm_windows = _Windows(capacity, seq_len, len(FEATURES[LSTM_COLUMNS]), window_stride)
+        self._battery_windows = _Windows(capacity, seq_len, len(BATTERY_COLUMNS), window_stride)
+        self._detectors = {}
+
+        self.processed = 0
+        self.ticks = 0
+        self.total_tick = 0.0
+        self.recent_latencies = deque(maxlen=20_000)
+        self._throughput = deque(maxlen=64)
+        self._room = asyncio.Condition()
+        self._task = None
+        self.last_error = None
+
+    # Streams
+
+    def _grow(self):
+        capacity = len(self.vehicle_ids)
+        new = 2 * capacity
+        width = self._pending.shape[2]
+        self._pending = np.concatenate([self._pending, np.zeros((capacity, self.max_pending, width))])
+        self._enqueued = np.concatenate([self._enqueued, np.zeros((capacity, self.max_pending))])
+        for name in ("_start", "_count", "frames", "anomalies", "shed"):
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(capacity, dtype=np.int64)]))
+        self.last_score = np.concatenate([self.last_score, np.full(capacity, np.nan)])
+        self.vehicle_ids.extend([None] * capacity)
+        self._free.extend(range(new - 1, capacity - 1, -1))
+
+    def _slot(self, vehicle_id: str) -> int:
+        slot = self._slots.get(vehicle_id)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._slots[vehicle_id] = slot
+            self.vehicle_ids[slot] = vehicle_id
+            self._start[slot] = self._count[slot] = 0
+            self.frames[slot] = self.anomalies[slot] = self.shed[slot] = 0
+            self.last_score[slot] = np.nan
+            self._new_slots.append(slot)
+        return slot
+
+    def remove(self, vehicle_id: str):
+        """Forget a stream; its slot is reused after the current tick"""
+        slot = self._slots.pop(vehicle_id, None)
+        if slot is not None:
+            self._count[slot] = 0
+            self.vehicle_ids[slot] = None
+            self._releasing.append(slot)
+            if self.policy == "block":
+                asyncio.ensure_future(self._notify())
+
+    async def _notify(self):
+        async with self._room:
+            self._room.notify_all()
+
+    @property
+    def streams(self) -> int:
+        return len(self._slots)
+
+    # Ingestion
+
+    def offer(self, vehicle_id: str, frame) -> bool:
+        """
+        Queue one frame (canonical feature order) without waiting
+
+        Returns False if the frame was rejected because the vehicle's queue
+        is full ("drop_newest", or "block" when called directly).
+        """
+        slot = self._slot(vehicle_id)
+        count = self._count[slot]
+        if count == self.max_pending:
+            self.shed[slot] += 1
+            if self.policy != "drop_oldest":
+                return False
+            self._start[slot] = (self._start[slot] + 1) % self.max_pending
+            count -= 1
+        position = (self._start[slot] + count) % self.max_pending
+        self._pending[slot, position] = frame
+        self._enqueued[slot, position] = time.perf_counter()
+        self._count[slot] = count + 1
+        return True
+
+    async def put(self, vehicle_id: str, frame) -> bool:
+        """Queue one frame; under the "block" policy, wait while the vehicle's queue is full"""
+        if self.policy == "block":
+            slot = self._slot(vehicle_id)
+            async with self._room:
+                await self._room.wait_for(lambda: self._count[slot] < self.max_pending or vehicle_id not in self._slots)
+        return self.offer(vehicle_id, frame)
+
+    # Processing
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            try:
+                await self.step()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                traceback.print_exc()
+            await asyncio.sleep(max(0.0, started + self.tick - loop.time()))
+
+    def _take(self) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Dequeue up to max_rounds frames per vehicle, one round at a time"""
+        rounds = []
+        for _ in range(self.max_rounds):
+            slots = np.flatnonzero(self._count)
+            if not len(slots):
+                break
+            position = self._start[slots]
+            rounds.append((slots, self._pending[slots, position], self._enqueued[slots, position]))
+            self._start[slots] = (position + 1) % self.max_pending
+            self._count[slots] -= 1
+        return rounds
+
+    async def step(self):
+        """Run one tick: dequeue, score in a worker thread, publish results"""
+        # No worker is running between ticks, so removed slots can be reused now
+        self._free.extend(self._releasing)
+        self._releasing = []
+        svm = self.svm()
+        if svm is None or not self._count.any():
+            return
+        detectors = {"svm": svm}
+        for name, get in (("lstm", self.lstm), ("battery", self.battery)):
+            detector = get() if get is not None else None
+            if detector is not None:
+                if self._detectors.get(name) is not detector:
+                    # Rows held so far were scaled for the previous version
+                    (self._lstm_windows if name == "lstm" else self._battery_windows).reset()
+                    self._detectors[name] = detector
+                detectors[name] = detector
+
+        for windows in (self._lstm_windows, self._battery_windows):
+            if len(windows.head) < len(self.vehicle_ids):
+                windows.grow(len(self.vehicle_ids))
+            windows.reset(self._new_slots)
+        if len(self._last_rows) < len(self.vehicle_ids):
+            extra = len(self.vehicle_ids) - len(self._last_rows)
+            self._last_rows = np.concatenate([self._last_rows, np.full((extra, self._last_rows.shape[1]), np.nan)])
+        self._last_rows[self._new_slots] = np.nan
+        self._new_slots = []
+
+        started = time.perf_counter()
+        rounds = self._take()
+        await self._notify()
+        result = await asyncio.to_thread(self._score, rounds, detectors)
+        done = time.perf_counter()
+
+        slots = result["slots"]
+        latencies = done - result["enqueued"]
+        self.recent_latencies.extend(latencies.tolist())
+        self.processed += len(slots)
+        self.ticks += 1
+        self.total_tick += done - started
+        self._throughput.append((done, self.processed))
+
+        np.add.at(self.frames, slots, 1)
+        np.add.at(self.anomalies, slots, result["is_anomaly"])
+        self.last_score[slots] = result["svm_score"]
+
+        if self.on_result is not None:
+            self.on_result({**result, "vehicle_ids": [self.vehicle_ids[s] for s in slots], "latency_s": latencies})
+
+    def _score(self, rounds: list, detectors: dict) -> dict:
+        slots = np.concatenate([s for s, _, _ in rounds])
+        rows = np.concatenate([r for _, r, _ in rounds])
+        enqueued = np.concatenate([e for _, _, e in rounds])
+        n = len(slots)
+
+        suspicious = np.zeros(n, dtype=bool)
+        if self.cascade is not None:
+            # Rounds in order, so each row is compared with its stream's previous one
+            suspicious = np.concatenate([
+                self._arrivals(round_slots, round_rows) for round_slots, round_rows, _ in rounds
+            ])
+
+        flood = np.zeros(n, dtype=bool)
+        replay = np.zeros(n, dtype=bool)
+        if self.timing is not None:
+            flood, replay = self._timing(slots, rows)
+            suspicious |= flood | replay
+
+        svm = detectors["svm"]
+        X_scaled = (rows - np.asarray(svm.scaler.mean_)) / np.asarray(svm.scaler.scale_)
+        passed = np.ones(n, dtype=bool) if self.cascade is None else self.cascade.svm_gate(svm, X_scaled)
+        scores = np.full(n, np.nan)
+        is_anomaly = flood | replay
+        if passed.any():
+            scored = svm.score_scaled(X_scaled[passed], cache=self.caches.get("svm"))
+            scores[passed] = scored["anomaly_scores"]
+            is_anomaly[passed] |= scored["predictions"] == 1
+        result = {
+            "slots": slots,
+            "timestamp": rows[:, 0],
+            "svm_score": scores,
+            "lstm_error": np.full(n, np.nan),
+            "battery_score": np.full(n, np.nan),
+            "flood": flood,
+            "replay": replay
+        }
+
+        offsets = np.cumsum([0] + [len(s) for s, _, _ in rounds])
+        for name, columns, windows in (
+            ("lstm", LSTM_COLUMNS, self._lstm_windows),
+            ("battery", BATTERY_COLUMNS, self._battery_windows)
+        ):
+            detector = detectors.get(name)
+            if detector is None:
+                continue
+            mean, scale = np.asarray(detector.scaler.mean_), np.asarray(detector.scaler.scale_)
+            # Windows from every round go through the model together
+            positions, batch = [], []
+            for (round_slots, round_rows, _), offset in zip(rounds, offsets):
+                full, gathered = windows.append(round_slots, (round_rows[:, columns] - mean) / scale)
+                positions.append(offset + np.searchsorted(round_slots, full))
+                batch.append(gathered)
+            positions = np.concatenate(positions)
+            if len(positions):
+                batch = np.concatenate(batch)
+                if self.cascade is not None:
+                    gate, sampled = self.cascade.window_gate(name, batch, suspicious[positions])
+                    positions, batch, sampled = positions[gate], batch[gate], sampled[gate]
+            if len(positions):
+                cache = self.caches.get(name)
+                if cache is None:
+                    errors = detector.score_windows(batch)
+                else:
+                    errors = cache.score_rows(detector, batch, detector.score_windows)
+                result[f"{name}_error" if name == "lstm" else "battery_score"][positions] = errors
+                is_anomaly[positions] |= errors > detector.threshold
+                if self.cascade is not None:
+                    self.cascade.observe(name, errors[sampled], detector.threshold)
+
+        result["is_anomaly"] = is_anomaly
+        result["enqueued"] = enqueued
+        return result
+
+    def _arrivals(self, slots: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        suspicious = self.cascade.arrivals(rows, self._last_rows[slots])
+        self._last_rows[slots] = rows
+        return suspicious
+
+    def _timing(self, slots: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Flood / replay flags per row, one `observe` per vehicle with its rows in arrival order"""
+        flood = np.zeros(len(slots), dtype=bool)
+        replay = np.zeros(len(slots), dtype=bool)
+        order = np.argsort(slots, kind="stable")
+        for group in np.split(order, np.flatnonzero(np.diff(slots[order])) + 1):
+            flags = self.timing.observe(rows[group], self.vehicle_ids[slots[group[0]]])
+            flood[group] = flags["flood"]
+            replay[group] = flags["replay"]
+        return flood, replay
+
+    def metrics(self) -> dict:
+        """Stream count, sustained throughput, end-to-end latency and shedding"""
+        latencies_ms = np.array(self.recent_latencies) * 1000
+        fps = 0.0
+        if len(self._throughput) > 1:
+            (t0, n0), (t1, n1) = self._throughput[0], self._throughput[-1]
+            fps = (n1 - n0) / (t1 - t0) if t1 > t0 else 0.0
+        return {
+            "streams": self.streams,
+            "capacity": len(self.vehicle_ids),
+            "policy": self.policy,
+            "tick_ms": self.tick * 1000,
+            "window_stride": self._lstm_windows.stride,
+            "pending": int(self._count.sum()),
+            "processed": self.processed,
+            "shed": int(self.shed.sum()),
+            "frames_per_s": round(fps, 1),
+            "latency_ms_p50": round(float(np.percentile(latencies_ms, 50)), 2) if len(latencies_ms) else None,
+            "latency_ms_p99": round(float(np.percentile(latencies_ms, 99)), 2) if len(latencies_ms) else None,
+            "mean_tick_ms": round(self.total_tick / self.ticks * 1000, 2) if self.ticks else 0.0,
+            "last_error": self.last_error
+        }
+
+    def vehicle(self, vehicle_id: str) -> dict | None:
+        """Counters and latest SVM score of one stream"""
+        slot = self._slots.get(vehicle_id)
+        if slot is None:
+            return None
+        return {
+            "vehicle_id": vehicle_id,
+            "frames": int(self.frames[slot]),
+            "anomalies": int(self.anomalies[slot]),
+            "shed": int(self.shed[slot]),
+            "pending": int(self._count[slot]),
+            "last_svm_score": None if np.isnan(self.last_score[slot]) else float(self.last_score[slot])
+        }
@@ -0,0 +1,73 @@
+"""
+Background model loading with per-model readiness
+"""
+
+import threading
+import time
+import traceback
+from typing import Callable
+
+
+class LazyModel:
+    """
+    A model built by `factory` on a background thread
+
+    The server starts accepting requests immediately; routes check `ready`
+    and answer 503 for models that are still warming up.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], object]):
+        self.name = name
+        self.factory = factory
+        # Called on the loader thread once the instance is ready
+        self.on_ready: Callable[[], None] | None = None
+        self.instance = None
+        self.state = "pending"
+        self.error = None
+        self.load_time = None
+        self._started_at = None
+        self._thread = None
+        self._done = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self):
+        """Begin loading on a daemon thread (no-op if already started)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._load, name=f"load-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _load(self):
+        self.state = "loading"
+        self._started_at = time.perf_counter()
+        try:
+            self.instance = self.factory()
+            self.state = "ready"
+            if self.on_ready is not None:
+                self.on_ready()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = "failed"
+            traceback.print_exc()
+        finally:
+            self.load_time = time.perf_counter() - self._started_at
+            self._done.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until loading finishes; True if the model is ready"""
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self) -> dict:
+        """Readiness and load time for the health endpoint"""
+        elapsed = self.load_time
+        if elapsed is None and self._started_at is not None:
+            elapsed = time.perf_counter() - self._started_at
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "load_time_s": round(elapsed, 3) if elapsed is not None else None,
+            "error": self.error
+        }
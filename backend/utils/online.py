@@ -0,0 +1,202 @@
+"""
+Online retraining of the One-Class SVM from confirmed-normal readings
+"""
+
+import copy
+import threading
+import time
+import traceback
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from utils.artifacts import ArtifactStore
+
+
+class Reservoir:
+    """
+    Uniform sample of at most `capacity` rows from an unbounded stream
+
+    Algorithm R: row t of the stream replaces a random slot with
+    probability capacity / (t + 1), so memory stays fixed however many
+    readings arrive and every reading seen so far is equally likely to
+    be in the sample.
+    """
+
+    def __init__(self, capacity: int, width: int, seed: int | None = None):
+        self.capacity = capacity
+        self.rows = np.empty((capacity, width))
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return min(self.seen, self.capacity)
+
+    def add(self, rows: np.ndarray) -> int:
+        """Offer rows to the sample; returns how many of them are in it afterwards"""
+        rows = np.asarray(rows, dtype=np.float64)
+        positions = self.seen + np.arange(len(rows))
+        slots = np.where(positions < self.capacity, positions, self._rng.integers(0, positions + 1))
+        keep = slots < self.capacity
+        # A slot drawn twice in one batch keeps the later row, as if the rows
+        # were added one by one; only distinct slots count as kept
+        self.rows[slots[keep]] = rows[keep]
+        self.seen += len(rows)
+        return len(np.unique(slots[keep]))
+
+    def snapshot(self) -> np.ndarray:
+        return self.rows[:len(self)].copy()
+
+
+class OnlineTrainer:
+    """
+    Refit the SVM in a background thread as confirmed-normal data arrives
+
+    Feedback goes into a bounded reservoir, seeded from the training
+    dataset, and into a running StandardScaler (partial_fit), so neither
+    update touches the full history again. Once `min_new` rows have
+    arrived, and at most every `min_interval_s`, the worker refits on a
+    snapshot of the reservoir and hands the new detector to `swap` along
+    with a version name ("online-<n>").
+    Requests keep scoring with the detector they already hold, so
+    nothing waits for a refit. While `live` returns False (another
+    version was put in service), refits are paused: the reservoir only
+    describes the online lineage.
+    """
+
+    def __init__(
+        self,
+        current: Callable[[], object],
+        swap: Callable[[object, str], None],
+        dataset_path: str = "data/CAN.csv",
+        artifact_dir: str = "models/artifacts",
+        capacity: int = 10_000,
+        min_new: int = 1000,
+        min_interval_s: float = 30.0,
+        seed: int | None = None,
+        live: Callable[[], bool] | None = None
+    ):
+        self.current = current
+        self.swap = swap
+        self.live = live or (lambda: True)
+        self.min_new = min_new
+        self.min_interval_s = min_interval_s
+        self.store = ArtifactStore(artifact_dir)
+
+        detector = current()
+        self.base_key = detector.artifact_key(dataset_path)
+        self.reservoir = Reservoir(capacity, len(detector.features), seed)
+        self.pending = 0
+        self.version = 0
+        self.last_refit = None
+        self.last_fit_s = None
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+        saved = self.store.load("svm_online", {"base": self.base_key})
+        if saved is not None:
+            # Resume the adapted model from before the restart
+            self.reservoir.rows[:len(saved["reservoir"])] = saved["reservoir"]
+            self.reservoir.seen = saved["seen"]
+            self.scaler = saved["scaler"]
+            self.version = saved["version"]
+            self._install(saved["state"])
+            print(f"✅ Online SVM resumed at version {self.version}")
+        else:
+            df = pd.read_csv(dataset_path)
+            df["datetime"] = pd.to_datetime(df["datetime"]).astype(int) / 10**9
+            X = df[detector.features].to_numpy(dtype=np.float64)
+            self.reservoir.add(X)
+            self.scaler = StandardScaler().fit(X)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="svm-online", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def add(self, rows: np.ndarray) -> int:
+        """Record confirmed-normal readings (SensorReading.to_array order)"""
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        with self._lock:
+            kept = self.reservoir.add(rows)
+            self.scaler.partial_fit(rows)
+            self.pending += len(rows)
+        if self.pending >= self.min_new:
+            self._wake.set()
+        return kept
+
+    def _due(self) -> bool:
+        if self.pending < self.min_new or not self.live():
+            return False
+        return self.last_refit is None or time.time() - self.last_refit >= self.min_interval_s
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(timeout=self.min_interval_s)
+            self._wake.clear()
+            if self._stopped or not self._due():
+                continue
+            try:
+                self.refit()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                traceback.print_exc()
+
+    def refit(self):
+        """Fit on the current reservoir and swap the new detector in"""
+        start = time.perf_counter()
+        with self._lock:
+            X = self.reservoir.snapshot()
+            seen = self.reservoir.seen
+            scaler = copy.deepcopy(self.scaler)
+            self.pending = 0
+
+        state = self.current().fit_matrix(X, scaler=scaler)
+        self.version += 1
+        self._install(state, X)
+        self.last_refit = time.time()
+        self.last_fit_s = time.perf_counter() - start
+        self.last_error = None
+        print(f"🔄 Online SVM v{self.version} fitted on {len(X):,} rows in {self.last_fit_s:.1f}s")
+
+        try:
+            self.store.save(
+                "svm_online",
+                {"reservoir": X, "seen": seen, "scaler": scaler, "version": self.version, "state": state},
+                {"base": self.base_key}
+            )
+        except OSError as e:
+            print(f"⚠️ Could not save online SVM: {e}")
+
+    def _install(self, state: dict, X: np.ndarray | None = None):
+        """Build a detector in the current detector's mode and swap it in"""
+        current = self.current()
+        detector = type(current).from_state(state, current.params)
+        if current.mode == "approx":
+            X = self.reservoir.snapshot() if X is None else X
+            detector.approx_params = current.approx_params
+            detector._apply_approximation(detector._fit_approximation(state["scaler"].transform(X)))
+        self.swap(detector, f"online-{self.version}")
+
+    def status(self) -> dict:
+        return {
+            "version": self.version,
+            "reservoir_rows": len(self.reservoir),
+            "readings_seen": self.reservoir.seen,
+            "pending": self.pending,
+            "min_new": self.min_new,
+            "paused": not self.live(),
+            "last_refit": self.last_refit,
+            "last_fit_s": round(self.last_fit_s, 2) if self.last_fit_s is not None else None,
+            "last_error": self.last_error
+        }
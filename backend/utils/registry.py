@@ -0,0 +1,202 @@
+"""
+Versioned model registry with atomic activation and rollback
+"""
+
+import gc
+import threading
+import time
+import weakref
+from typing import Callable
+
+from utils.lazy import LazyModel
+
+
+class ModelSlot:
+    """
+    Every loaded version of one model, with exactly one active
+
+    Routes look up `instance` once per request, so activation is a single
+    pointer swap: requests already running finish on the version they
+    started with. Inactive versions are kept for rollback up to `keep`;
+    older ones are retired, which drops the registry's reference. A
+    retired version is reported as draining while any request, session
+    or background job still holds it and disappears once it is freed.
+
+    One loaded, inactive version can be marked as the `shadow` candidate,
+    to be scored alongside the active one without serving responses.
+    """
+
+    def __init__(self, name: str, keep: int = 2):
+        self.name = name
+        self.keep = keep
+        self.versions: dict[str, LazyModel] = {}
+        self.active: str | None = None
+        self.shadow: str | None = None
+        self.history: list[str] = []
+        self._last_active: dict[str, int] = {}
+        self._activations = 0
+        self._retired: dict[str, weakref.ref] = {}
+        self._lock = threading.RLock()
+        self._first_ready = threading.Event()
+
+    # Same surface as LazyModel for the active version
+
+    @property
+    def ready(self) -> bool:
+        return self.active is not None
+
+    @property
+    def instance(self):
+        active = self.active
+        return self.versions[active].instance if active is not None else None
+
+    @property
+    def state(self) -> str:
+        if self.active is not None:
+            return "ready"
+        states = {model.state for model in self.versions.values()}
+        return "failed" if states == {"failed"} else "loading" if states else "pending"
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until some version is active or every load has failed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.ready:
+            if self.state == "failed":
+                return False
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._first_ready.wait(0.1 if remaining is None else min(remaining, 0.1))
+        return True
+
+    def shadow_candidate(self) -> tuple[str, object] | None:
+        """(version, instance) of the shadow candidate, if one is set and loaded"""
+        shadow = self.shadow
+        model = self.versions.get(shadow) if shadow is not None else None
+        return (shadow, model.instance) if model is not None and model.ready else None
+
+    # Admin operations
+
+    def load(self, version: str, factory: Callable[[], object], activate: bool = False) -> LazyModel:
+        """Start loading `version` in the background, optionally activating it when ready"""
+        with self._lock:
+            if version in self.versions:
+                raise ValueError(f"{self.name} version '{version}' already exists")
+            model = LazyModel(f"{self.name}:{version}", factory)
+            if activate:
+                model.on_ready = lambda: self.activate(version)
+            self.versions[version] = model
+        model.start()
+        return model
+
+    def publish(self, version: str, instance, activate: bool = True):
+        """Register an already-built instance (e.g. from online retraining)"""
+        model = LazyModel(f"{self.name}:{version}", lambda: instance)
+        with self._lock:
+            self.versions[version] = model
+        model.start()
+        model.wait()
+        if activate:
+            self.activate(version)
+
+    def activate(self, version: str):
+        """Route all new lookups to `version`"""
+        with self._lock:
+            model = self.versions.get(version)
+            if model is None:
+                raise KeyError(f"{self.name} has no version '{version}'")
+            if not model.ready:
+                raise ValueError(f"{self.name} version '{version}' is {model.state}")
+            if version == self.active:
+                return
+            if self.active is not None:
+                self.history.append(self.active)
+            self._set_active(version)
+        self._first_ready.set()
+        print(f"🔀 {self.name} now serving version '{version}'")
+
+    def rollback(self) -> str:
+        """Reactivate the most recent previous version that is still loaded"""
+        with self._lock:
+            while self.history:
+                version = self.history.pop()
+                if version in self.versions and self.versions[version].ready:
+                    self._set_active(version)
+                    print(f"↩️ {self.name} rolled back to version '{version}'")
+                    return version
+            raise ValueError(f"{self.name} has no earlier version to roll back to")
+
+    def set_shadow(self, version: str | None):
+        """Score `version` in the background against the active one (None to stop)"""
+        with self._lock:
+            if version is not None:
+                if version not in self.versions:
+                    raise KeyError(f"{self.name} has no version '{version}'")
+                if version == self.active:
+                    raise ValueError(f"{self.name} version '{version}' is already active")
+            self.shadow = version
+
+    def unload(self, version: str):
+        """Retire an inactive version; it is freed once nothing uses it"""
+        with self._lock:
+            if version == self.active:
+                raise ValueError(f"Cannot unload the active {self.name} version")
+            if version not in self.versions:
+                raise KeyError(f"{self.name} has no version '{version}'")
+            self._retire(version)
+        gc.collect()
+
+    def _set_active(self, version: str):
+        self.active = version
+        if version == self.shadow:
+            self.shadow = None
+        self._activations += 1
+        self._last_active[version] = self._activations
+        self._prune()
+
+    def _prune(self):
+        """
+        Keep the `keep` most recently active standby versions
+
+        Versions that were loaded but never activated (candidates) are
+        left alone; failed loads are dropped.
+        """
+        standby = sorted(
+            (v for v in self.versions if v != self.active and v in self._last_active),
+            key=self._last_active.get, reverse=True
+        )
+        for version in standby[self.keep:]:
+            self._retire(version)
+        for version in [v for v, m in self.versions.items() if m.state == "failed"]:
+            self._retire(version)
+
+    def _retire(self, version: str):
+        model = self.versions.pop(version)
+        if version == self.shadow:
+            self.shadow = None
+        self.history = [v for v in self.history if v != version]
+        self._last_active.pop(version, None)
+        if model.instance is not None:
+            try:
+                self._retired[version] = weakref.ref(model.instance)
+            except TypeError:
+                pass
+
+    def status(self) -> dict:
+        """Active version plus the state of every loaded or draining version"""
+        with self._lock:
+            active = self.versions.get(self.active)
+            self._retired = {v: ref for v, ref in self._retired.items() if ref() is not None}
+            return {
+                **(active.status() if active is not None else {
+                    "state": self.state, "ready": False, "load_time_s": None, "error": None
+                }),
+                "active_version": self.active,
+                "versions": {
+                    version: {**model.status(), "active": version == self.active}
+                    for version, model in self.versions.items()
+                },
+                "shadow_version": self.shadow,
+                "rollback_to": self.history[-1] if self.history else None,
+                "draining": sorted(self._retired)
+            }
@@ -0,0 +1,194 @@
+"""
+Per-connection streaming state for the real-time WebSocket
+"""
+
+import asyncio
+
+import numpy as np
+
+from schemas.features import FEATURES, LSTM_COLUMNS, BATTERY_COLUMNS
+
+
+class RingBuffer:
+    """
+    Fixed-size window over the most recent rows
+
+    Every row is written twice, `size` apart, so the latest window is always
+    one contiguous slice and reading it never copies or reorders data.
+    """
+
+    def __init__(self, size: int, width: int):
+        self.size = size
+        self._data = np.zeros((2 * size, width))
+        self._head = 0
+        self.count = 0
+
+    def append(self, row: np.ndarray):
+        self._data[self._head] = row
+        self._data[self._head + self.size] = row
+        self._head = (self._head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.size
+
+    def window(self) -> np.ndarray:
+        """Rows in arrival order, oldest first (a view, valid until the next append)"""
+        return self._data[self._head:self._head + self.size]
+
+
+def _scaling(scaler) -> tuple[np.ndarray, np.ndarray]:
+    """StandardScaler parameters for applying it without sklearn call overhead"""
+    return np.asarray(scaler.mean_), np.asarray(scaler.scale_)
+
+
+class StreamSession:
+    """
+    Incremental detection state for one vehicle stream
+
+    Each frame is scaled once per model and appended to that model's ring
+    buffer, so the sequence models run on the window already held here
+    instead of the client resending its history.
+
+    Only the SVM is required up front; the sequence models are attached
+    when they become available and start scoring once their window fills.
+
+    `caches` optionally maps model names to `utils.cache.ScoreCache`s, so
+    repeated readings and windows are not scored again. With a
+    `utils.cascade.Cascade`, models it screens out report
+    `"screened": true` and no score. A `utils.timing.TimingDetector` adds
+    a "timing" verdict (flood / replay) for the vehicle's arrival stream;
+    its flags also mark the reading as suspicious for the cascade.
+    """
+
+    def __init__(
+        self, vehicle_id: str, svm_detector, scheduler, lstm_detector=None, battery_detector=None,
+        caches: dict | None = None, cascade=None, timing=None
+    ):
+        self.vehicle_id = vehicle_id
+        self.svm = svm_detector
+        self.scheduler = scheduler
+        self.caches = caches or {}
+        self.cascade = cascade
+        self.timing = timing
+        self._last_raw = np.full(len(FEATURES), np.nan)
+        self.frames = 0
+        self.lstm = self.battery = None
+
+        self._svm_scaling = _scaling(svm_detector.scaler)
+        if lstm_detector is not None:
+            self.attach("lstm", lstm_detector)
+        if battery_detector is not None:
+            self.attach("battery", battery_detector)
+
+    def use_svm(self, detector):
+        """Switch to a retrained SVM between frames"""
+        if detector is not self.svm:
+            self.svm = detector
+            self._svm_scaling = _scaling(detector.scaler)
+
+    def attach(self, name: str, detector):
+        """
+        Add or switch the "lstm" or "battery" detector (no-op if unchanged)
+
+        Switching versions restarts that model's window, since the rows
+        held so far were scaled for the previous version.
+        """
+        if name == "lstm" and detector is not self.lstm:
+            self.lstm = detector
+            self._lstm_scaling = _scaling(detector.scaler)
+            self.lstm_window = RingBuffer(detector.seq_len, len(detector.features))
+        elif name == "battery" and detector is not self.battery:
+            self.battery = detector
+            self._battery_scaling = _scaling(detector.scaler)
+            self.battery_window = RingBuffer(detector.seq_len, len(BATTERY_COLUMNS))
+
+    def _score_window(self, name: str, detector, window: np.ndarray):
+        """Error of a scaled window from the cache or a batched forward pass"""
+        submit = lambda: self.scheduler.submit(name, window, detector.score_windows)
+        cache = self.caches.get(name)
+        return submit() if cache is None else cache.score_window(detector, window, submit)
+
+    async def process(self, values: list[float]) -> dict:
+        """Ingest one reading (SensorReading.to_array order) and return its verdict"""
+        raw = np.asarray(values, dtype=np.float64)
+        self.frames += 1
+
+        suspicious = np.zeros(1, dtype=bool)
+        if self.cascade is not None:
+            suspicious = self.cascade.arrivals(raw[np.newaxis], self._last_raw[np.newaxis])
+            self._last_raw = raw
+        timing = None
+        if self.timing is not None:
+            timing = self.timing.summary(self.timing.observe(raw[np.newaxis], self.vehicle_id))
+            suspicious |= timing["is_anomaly"]
+
+        mean, scale = self._svm_scaling
+        svm_scaled = ((raw - mean) / scale)[np.newaxis]
+        svm_score = None
+        if self.cascade is None or self.cascade.svm_gate(self.svm, svm_scaled)[0]:
+            svm = self.svm.score_scaled(svm_scaled, cache=self.caches.get("svm"))
+            svm_score = float(svm["anomaly_scores"][0])
+
+        if self.lstm is not None:
+            mean, scale = self._lstm_scaling
+            self.lstm_window.append((raw[LSTM_COLUMNS] - mean) / scale)
+        if self.battery is not None:
+            mean, scale = self._battery_scaling
+            self.battery_window.append((raw[BATTERY_COLUMNS] - mean) / scale)
+
+        # Windows are passed as views: nothing appends to them until the
+        # results below have come back
+        pending, screened, sampled = {}, set(), set()
+        for name, detector in (("lstm", self.lstm), ("battery", self.battery)):
+            if detector is None or not getattr(self, f"{name}_window").full:
+                continue
+            window = getattr(self, f"{name}_window").window()
+            if self.cascade is not None:
+                passed, was_sampled = self.cascade.window_gate(name, window[np.newaxis], suspicious)
+                if not passed[0]:
+                    screened.add(name)
+                    continue
+                if was_sampled[0]:
+                    sampled.add(name)
+            pending[name] = self._score_window(name, detector, window)
+        errors = dict(zip(pending, await asyncio.gather(*pending.values())))
+        for name in sampled:
+            self.cascade.observe(name, [errors[name]], getattr(self, name).threshold)
+
+        models = {
+            "svm": {"is_anomaly": False, "anomaly_score": None, "screened": True} if svm_score is None else {
+                "is_anomaly": bool(svm["predictions"][0] == 1),
+                "anomaly_score": svm_score
+            },
+            "lstm": None,
+            "battery": None
+        }
+        if timing is not None:
+            models["timing"] = timing
+        if "lstm" in errors:
+            models["lstm"] = {
+                "is_anomaly": bool(errors["lstm"] > self.lstm.threshold),
+                "reconstruction_error": float(errors["lstm"])
+            }
+        if "battery" in errors:
+            models["battery"] = {
+                "is_anomaly": bool(errors["battery"] > self.battery.threshold),
+                "anomaly_score": float(errors["battery"])
+            }
+        if "lstm" in screened:
+            models["lstm"] = {"is_anomaly": False, "reconstruction_error": None, "screened": True}
+        if "battery" in screened:
+            models["battery"] = {"is_anomaly": False, "anomaly_score": None, "screened": True}
+
+        # Screened readings score below the anomaly threshold
+        level = -np.inf if svm_score is None else svm_score
+        return {
+            "vehicle_id": self.vehicle_id,
+            "frame": self.frames,
+            "is_anomaly": any(m["is_anomaly"] for m in models.values() if m is not None),
+            "score": svm_score,
+            "severity": "high" if level > 80 else "medium" if level > 60 else "low",
+            "models": models
+        }
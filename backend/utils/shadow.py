@@ -0,0 +1,167 @@
+"""
+Shadow scoring of candidate model versions against live traffic
+"""
+
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+
+import numpy as np
+
+
+def _score(name: str, detector, inputs) -> tuple[np.ndarray, np.ndarray]:
+    """Scores and anomaly flags of one request, in the detector's own units"""
+    if name == "svm":
+        result = detector.detect_batch(inputs)
+        return result["anomaly_scores"], result["predictions"] == 1
+    # LSTM / battery: raw (unscaled) sequence, so each version applies its own scaler
+    is_anomaly, error = detector.detect(inputs)
+    return np.array([error]), np.array([is_anomaly])
+
+
+class _ShadowStats:
+    """Running comparison of one candidate version against the live one"""
+
+    def __init__(self, version: str):
+        self.version = version
+        self.requests = 0
+        self.rows = 0
+        self.disagreements = 0
+        self.candidate_only = 0
+        self.primary_only = 0
+        self.total_abs_diff = 0.0
+        self.max_abs_diff = 0.0
+        self.errors = 0
+        self.last_error = None
+        self.recent_primary = deque(maxlen=1000)
+        self.recent_candidate = deque(maxlen=1000)
+        self.recent_disagreements = deque(maxlen=20)
+
+    def record(self, primary_scores, primary_flags, scores, flags, primary_s: float, candidate_s: float):
+        primary_scores = np.asarray(primary_scores, dtype=np.float64)
+        primary_flags = np.asarray(primary_flags, dtype=bool)
+        diff = np.abs(scores - primary_scores)
+        mismatch = flags != primary_flags
+
+        self.requests += 1
+        self.rows += len(scores)
+        self.disagreements += int(mismatch.sum())
+        self.candidate_only += int((flags & ~primary_flags).sum())
+        self.primary_only += int((primary_flags & ~flags).sum())
+        self.total_abs_diff += float(diff.sum())
+        self.max_abs_diff = max(self.max_abs_diff, float(diff.max()))
+        self.recent_primary.append(primary_s)
+        self.recent_candidate.append(candidate_s)
+        for i in np.flatnonzero(mismatch)[:5]:
+            self.recent_disagreements.append({
+                "at": time.time(),
+                "primary_score": float(primary_scores[i]),
+                "candidate_score": float(scores[i]),
+                "candidate_flag": bool(flags[i])
+            })
+
+    def metrics(self) -> dict:
+        primary_ms = np.array(self.recent_primary) * 1000
+        candidate_ms = np.array(self.recent_candidate) * 1000
+
+        def percentile(values, q):
+            return round(float(np.percentile(values, q)), 3) if len(values) else None
+
+        return {
+            "candidate_version": self.version,
+            "requests": self.requests,
+            "rows": self.rows,
+            "disagreements": self.disagreements,
+            "disagreement_rate": self.disagreements / self.rows if self.rows else 0.0,
+            "flagged_by_candidate_only": self.candidate_only,
+            "flagged_by_primary_only": self.primary_only,
+            "score_mae": self.total_abs_diff / self.rows if self.rows else 0.0,
+            "score_max_abs_diff": self.max_abs_diff,
+            "primary_ms_p50": percentile(primary_ms, 50),
+            "primary_ms_p99": percentile(primary_ms, 99),
+            "candidate_ms_p50": percentile(candidate_ms, 50),
+            "candidate_ms_p99": percentile(candidate_ms, 99),
+            "latency_delta_ms_p50": percentile(candidate_ms - primary_ms, 50),
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "recent_disagreements": list(self.recent_disagreements)
+        }
+
+
+class ShadowScorer:
+    """
+    Re-score live requests with a candidate version on a background thread
+
+    Routes call `offer` after computing their own response. It only reads
+    the slot's shadow candidate and does a non-blocking put on a bounded
+    queue, so the primary response never waits for the candidate; when
+    the worker falls behind, requests are dropped from the comparison and
+    counted instead. Primary latency is what the route measured around
+    its own scoring (including micro-batching); candidate latency is a
+    direct call on the worker thread.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.dropped: dict[str, int] = {}
+        self._stats: dict[str, _ShadowStats] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="shadow", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self.queue.put(None)
+
+    def offer(self, name: str, slot, inputs, primary_scores, primary_flags, primary_s: float):
+        """Queue one scored request for comparison if `slot` has a shadow candidate"""
+        candidate = slot.shadow_candidate()
+        if candidate is None:
+            return
+        try:
+            self.queue.put_nowait((name, *candidate, inputs, primary_scores, primary_flags, primary_s))
+        except queue.Full:
+            self.dropped[name] = self.dropped.get(name, 0) + 1
+
+    def _run(self):
+        # Jobs are handled in their own call: no local may keep the last
+        # candidate detector alive while this thread waits on get()
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            self._process(*job)
+            job = None
+
+    def _process(self, name: str, version: str, detector, inputs, primary_scores, primary_flags, primary_s: float):
+        """Score one job with the candidate and record the comparison"""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None or stats.version != version:
+                # New candidate: start its comparison from scratch
+                stats = self._stats[name] = _ShadowStats(version)
+        try:
+            start = time.perf_counter()
+            scores, flags = _score(name, detector, inputs)
+            candidate_s = time.perf_counter() - start
+            with self._lock:
+                stats.record(primary_scores, primary_flags, scores, flags, primary_s, candidate_s)
+        except Exception as e:
+            stats.errors += 1
+            stats.last_error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+
+    def metrics(self) -> dict:
+        """Per-model disagreement and latency deltas of the current candidates"""
+        with self._lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "max_queue": self.queue.maxsize,
+                "dropped": dict(self.dropped),
+                "models": {name: stats.metrics() for name, stats in self._stats.items()}
+            }
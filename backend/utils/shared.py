@@ -0,0 +1,59 @@
+"""
+Read-only model arrays shared between worker processes through mmap
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Set by `manage.py serve` so workers map the arrays the parent exported
+SHARED_DIR_ENV = "CAN_SHARED_MODELS"
+
+
+def default_shared_dir() -> str:
+    """RAM-backed /dev/shm when available, otherwise next to the artifacts"""
+    if os.path.isdir("/dev/shm"):
+        return f"/dev/shm/can-ids-{os.getuid()}"
+    return "models/artifacts/shared"
+
+
+def export_arrays(directory: str, arrays: dict[str, np.ndarray], meta: dict | None = None):
+    """
+    Write each array as an .npy file plus a manifest
+
+    Files are written atomically so workers that are already running keep
+    mapping the old version until they reopen the directory.
+    """
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+
+    for name, array in arrays.items():
+        fd, tmp_path = tempfile.mkstemp(dir=root, prefix=f".{name}.", suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.ascontiguousarray(array), allow_pickle=False)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, root / f"{name}.npy")
+
+    manifest = {
+        "arrays": {name: {"shape": list(a.shape), "dtype": str(a.dtype)} for name, a in arrays.items()},
+        "meta": meta or {}
+    }
+    (root / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+
+def open_arrays(directory: str) -> dict[str, np.ndarray]:
+    """
+    Map every exported array read-only
+
+    The pages live in the OS page cache once, however many processes map
+    them, so N workers cost one copy of the arrays rather than N.
+    """
+    root = Path(directory)
+    manifest = json.loads((root / "manifest.json").read_text())
+    return {
+        name: np.load(root / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+        for name in manifest["arrays"]
+    }
@@ -0,0 +1,192 @@
+"""
+Flood and replay detection from the arrival timing of each stream
+"""
+
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+
+def payloads(rows: np.ndarray) -> list[bytes]:
+    """Sensor values of each reading as bytes (the timestamp is left out)"""
+    values = np.ascontiguousarray(rows[:, 1:], dtype=np.float64)
+    return values.view(np.dtype((np.void, values.shape[1] * values.itemsize))).ravel().tolist()
+
+
+class _Stream:
+    """Bounded history of one stream: recent timestamps and payloads"""
+
+    def __init__(self, window: int, history: int):
+        self.timestamps = deque(maxlen=window)
+        # (payload, frame index, repeated) of the last `history` frames
+        self.recent = deque()
+        self.last_seen = {}
+        self.repeats = 0
+        self.frames = 0
+        self.floods = 0
+        self.replays = 0
+        self.rate_hz = None
+
+
+class TimingDetector:
+    """
+    Per-stream flood and replay flags from timestamps and repeated payloads
+
+    The models score readings, not their timing, yet DoS traffic arrives
+    in sub-millisecond bursts and replays repeat earlier readings. Each
+    stream keeps only its last `window` timestamps and its last `history`
+    payloads, with running counts, so memory per stream is constant and
+    each frame is an O(1) update.
+
+    For each frame, with m the number of earlier frames held (at most
+    `window`):
+      - flood: those m frames span more than 0 and less than
+        m / `max_rate_hz` seconds (needs m >= `min_frames`). A span of
+        exactly 0 is read as a coarse clock, not a flood: CAN.csv stamps
+        whole minutes with up to 116 readings per stamp, so `window` has
+        to exceed that.
+      - out_of_order: the timestamp is earlier than the previous frame's
+      - repeated: the sensor values equal one of the last `history` frames'
+      - replay: out_of_order, or more than `max_repeat_share` of the last
+        `history` frames repeated. CAN.csv has stretches where every
+        reading is logged twice (a share of exactly 0.5); a DoS flood
+        repeating each reading five times reaches 0.8.
+
+    Streams are identified by `stream_id`; at most `max_streams` are kept,
+    least recently seen dropped first. Without an id a batch is checked
+    on its own and nothing is kept.
+    """
+
+    def __init__(
+        self,
+        max_rate_hz: float = 1000.0,
+        window: int = 128,
+        min_frames: int = 4,
+        history: int = 256,
+        max_repeat_share: float = 0.5,
+        max_streams: int = 10_000
+    ):
+        if window < min_frames or min_frames < 1:
+            raise ValueError("Need window >= min_frames >= 1")
+        self.max_rate_hz = max_rate_hz
+        self.window = window
+        self.min_frames = min_frames
+        self.history = history
+        self.max_repeat_share = max_repeat_share
+        self.max_streams = max_streams
+
+        self._streams: OrderedDict[str, _Stream] = OrderedDict()
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.floods = 0
+        self.replays = 0
+
+    def _stream(self, stream_id: str | None) -> _Stream:
+        if stream_id is None:
+            return _Stream(self.window, self.history)
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            stream = self._streams[stream_id] = _Stream(self.window, self.history)
+            if len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+        self._streams.move_to_end(stream_id)
+        return stream
+
+    def observe(self, rows: np.ndarray, stream_id: str | None = None) -> dict[str, np.ndarray]:
+        """
+        Flags for each reading of `rows` ((n, features), canonical order, oldest first)
+
+        Returns per-reading arrays: flood, replay, out_of_order, repeated
+        and rate_hz (NaN until `min_frames` frames span a measurable time).
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        n = len(rows)
+        flood, replay, out_of_order, repeated, rate_hz = [], [], [], [], []
+
+        with self._lock:
+            stream = self._stream(stream_id)
+            timestamps, recent, last_seen = stream.timestamps, stream.recent, stream.last_seen
+            frame = stream.frames
+            for t, payload in zip(rows[:, 0].tolist(), payloads(rows)):
+                # Rate over the frames held in the window
+                m = len(timestamps)
+                span = t - timestamps[0] if m else 0.0
+                rate = m / span if m >= self.min_frames and span > 0 else float("nan")
+                flood.append(rate > self.max_rate_hz)
+                rate_hz.append(rate)
+                late = bool(m) and t < timestamps[-1]
+                out_of_order.append(late)
+                timestamps.append(t)
+
+                # Repeat of a payload among the last `history` frames
+                previous = last_seen.get(payload)
+                repeat = previous is not None and frame - previous <= self.history
+                last_seen[payload] = frame
+                recent.append((payload, frame, repeat))
+                stream.repeats += repeat
+                if len(recent) > self.history:
+                    old_payload, old_frame, old_repeat = recent.popleft()
+                    stream.repeats -= old_repeat
+                    if last_seen[old_payload] == old_frame:
+                        del last_seen[old_payload]
+                repeated.append(repeat)
+                replay.append(late or stream.repeats > self.max_repeat_share * len(recent))
+                frame += 1
+
+            floods, replays = sum(flood), sum(replay)
+            stream.frames = frame
+            stream.floods += floods
+            stream.replays += replays
+            measured = [rate for rate in rate_hz if rate == rate]
+            if measured:
+                stream.rate_hz = measured[-1]
+            self.frames += n
+            self.floods += floods
+            self.replays += replays
+
+        return {
+            "flood": np.array(flood, dtype=bool),
+            "replay": np.array(replay, dtype=bool),
+            "out_of_order": np.array(out_of_order, dtype=bool),
+            "repeated": np.array(repeated, dtype=bool),
+            "rate_hz": np.array(rate_hz)
+        }
+
+    def summary(self, flags: dict[str, np.ndarray]) -> dict:
+        """Verdict for the latest reading of an `observe` result"""
+        rate_hz = flags["rate_hz"][-1]
+        return {
+            "is_anomaly": bool(flags["flood"][-1] or flags["replay"][-1]),
+            "flood": bool(flags["flood"][-1]),
+            "replay": bool(flags["replay"][-1]),
+            "rate_hz": None if np.isnan(rate_hz) else round(float(rate_hz), 3)
+        }
+
+    def stream(self, stream_id: str) -> dict | None:
+        """Counters and latest rate of one stream"""
+        with self._lock:
+            stream = self._streams.get(stream_id)
+            if stream is None:
+                return None
+            return {
+                "stream_id": stream_id,
+                "frames": stream.frames,
+                "flood_frames": stream.floods,
+                "replay_frames": stream.replays,
+                "rate_hz": stream.rate_hz
+            }
+
+    def metrics(self) -> dict:
+        """Streams tracked, frames seen and flagged, and the thresholds in use"""
+        with self._lock:
+            return {
+                "streams": len(self._streams),
+                "frames": self.frames,
+                "flood_frames": self.floods,
+                "replay_frames": self.replays,
+                "max_rate_hz": self.max_rate_hz,
+                "window": self.window,
+                "history": self.history,
+                "max_repeat_share": self.max_repeat_share
+            }
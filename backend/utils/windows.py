@@ -0,0 +1,35 @@
+"""
+Sliding-window helpers for the sequence models
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(data: np.ndarray, seq_len: int) -> np.ndarray:
+    """
+    Every window of seq_len consecutive rows, as a read-only strided view
+
+    Args:
+        data: (n_rows, n_features) array
+        seq_len: Rows per window
+
+    Returns:
+        (n_rows - seq_len + 1, seq_len, n_features) view sharing memory
+        with `data`; window i covers rows i .. i + seq_len - 1
+    """
+    if len(data) < seq_len:
+        return np.empty((0, seq_len, data.shape[1]), dtype=data.dtype)
+    return sliding_window_view(data, seq_len, axis=0).transpose(0, 2, 1)
+
+
+def window_batches(windows: np.ndarray, batch_size: int):
+    """
+    Yield (start_index, batch) with each batch copied into contiguous memory
+
+    Only one batch is materialized at a time, so peak memory is
+    batch_size * seq_len * n_features regardless of how many windows the
+    view describes.
+    """
+    for start in range(0, len(windows), batch_size):
+        yield start, np.ascontiguousarray(windows[start:start + batch_size])